@@ -0,0 +1,100 @@
+# admission.py
+# Header-only probes and cost-based admission control. probe() reads just enough
+# of a carrier to learn its capacity and a rough cost. That means image size from
+# a lazy PIL open, the WAV frame count, or the video frame count and resolution.
+# Requests that can't fit, or that would overload the server, are turned away
+# before anything is decoded.
+import contextlib, threading
+import backends
+
+# rough single-core throughput in pixels or samples per second, from bench.py;
+# extraction assumes the whole carrier is scanned, which is the worst case
+RATES = {
+    ('image', 'embed'): 4e6, ('image', 'extract'): 30e6,
+    ('audio', 'embed'): 200e6, ('audio', 'extract'): 200e6,
+    ('video', 'embed'): 3.5e6, ('video', 'extract'): 30e6,
+}
+UNKNOWN_COST = 30.0  # seconds assumed when the header doesn't tell (e.g. no frame count)
+
+class Rejected(ValueError):
+    # the request can never succeed as sent: payload too big, carrier unreadable, too costly
+    pass
+
+class Busy(Exception):
+    # the server is at its cost budget; the same request may succeed later
+    pass
+
+BUSY = "The server is busy right now; please try again shortly."
+
+def probe(kind: str, src) -> dict:
+    # backend probe plus payload capacity in bytes and estimated seconds per operation
+    try:
+        info = backends.get(kind).probe(src)
+    except Exception:
+        # parser messages can name temp files or store paths, so they aren't passed on
+        raise Rejected(f"Unreadable {kind} file") from None
+    finally:
+        if hasattr(src, 'seek'):
+            src.seek(0)
+    from utils import HEADER  # numpy; the backend probe has loaded it already
+    bits, units = info['capacity_bits'], info['units']
+    info['kind'] = kind
+    info['capacity_bytes'] = None if bits is None else max(0, bits // 8 - HEADER.size)
+    for op in ('embed', 'extract'):
+        info[f'{op}_cost'] = units / RATES[kind, op] if units else UNKNOWN_COST
+    return info
+
+def payload_bits(message, password: str = None, compression: str = 'auto', capacity_bits: int = None) -> int:
+    # framed payload size, estimated without compressing where possible: ciphertext
+    # (stored uncompressed) is sized from the plaintext length, and 'auto' never
+    # stores more than the raw bytes, so only a raw message too big for
+    # capacity_bits is actually compressed to see whether it fits
+    from utils import HEADER
+    data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+    if password:
+        from security import encrypted_size
+        return (HEADER.size + encrypted_size(len(data))) * 8
+    bits = (HEADER.size + len(data)) * 8
+    if compression == 'none' or (compression == 'auto' and (capacity_bits is None or bits <= capacity_bits)):
+        return bits
+    from utils import frame_payload
+    return len(frame_payload(data, compression)) * 8
+
+def check_fits(info: dict, message, password: str = None, compression: str = 'auto'):
+    from utils import HEADER
+    capacity = info['capacity_bits']
+    bits = payload_bits(message, password, compression, capacity)
+    if capacity is not None and bits > capacity:
+        raise Rejected(f"The {info['kind']} doesn't have enough capacity for this message "
+                       f"(needs {bits // 8 - HEADER.size} bytes, holds {info['capacity_bytes']})")
+
+class CostLimiter:
+    # Bounds the estimated seconds of work in flight. A single request may always
+    # start when nothing else is running, unless it exceeds max_cost by itself.
+    def __init__(self, budget: float, max_cost: float = None):
+        self.budget = budget
+        self.max_cost = max_cost
+        self.in_flight = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: float) -> bool:
+        if self.max_cost is not None and cost > self.max_cost:
+            raise Rejected(f"This request is too large to process (estimated {cost:.0f}s of work)")
+        with self._lock:
+            if self.in_flight and self.in_flight + cost > self.budget:
+                return False
+            self.in_flight += cost
+            return True
+
+    def release(self, cost: float):
+        with self._lock:
+            self.in_flight = max(0.0, self.in_flight - cost)
+
+    @contextlib.contextmanager
+    def admit(self, cost: float):
+        if not self.acquire(cost):
+            raise Busy(BUSY)
+        try:
+            yield
+        finally:
+            self.release(cost)
@@ -1,12 +1,14 @@
-import os, io, base64
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for
+import os, io, base64, tempfile, time
+from functools import partial
+from flask import Flask, render_template, request, send_file, flash, redirect, url_for, jsonify, abort, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
-from PIL import Image
 
-from stego import embed_message as embed_text_in_image, extract_message as extract_text_from_image
-from security import encrypt_message, decrypt_message
-from audio_stego import embed_text_in_wav, extract_text_from_wav
-from video_stego import embed_text_in_video, extract_text_from_video
+import backends, metrics, admission
+from jobs import JobQueue, embed_task, extract_task, FINISHED
+from store import BlobStore
+from cache import ExtractionCache, content_digest
+from batch import BatchRunner, carrier_kind, embed_item, extract_item, scan_item, to_ndjson, to_zip, OUTPUT_NAMES
+from compression import CODECS
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -15,6 +17,155 @@ app = Flask(__name__)
 app.secret_key = os.urandom(24)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 256 * 1024 * 1024  # allow big media
+app.config['JOB_WORKERS'] = 2          # concurrent audio/video jobs, across all web workers
+app.config['JOB_TIMEOUT'] = 15 * 60    # seconds before a job is killed
+app.config['SPOOL_MAX_BYTES'] = 16 * 1024 * 1024     # results larger than this spill to a temp file
+app.config['INLINE_AUDIO_BYTES'] = 32 * 1024 * 1024  # smaller WAVs are processed within the request
+app.config['STORE_MAX_BYTES'] = 2 * 1024 ** 3   # uploads/results kept on disk before LRU eviction
+app.config['STORE_MAX_AGE'] = 24 * 3600         # seconds an unused blob survives
+app.config['EXTRACT_CACHE_BYTES'] = 32 * 1024 * 1024  # memory for memoized extraction payloads
+app.config['BATCH_WORKERS'] = os.cpu_count() or 1   # processes behind the batch API
+app.config['BATCH_COST_BUDGET'] = 2.0 * app.config['BATCH_WORKERS']  # estimated seconds of batch work at once
+app.config['INLINE_COST_BUDGET'] = 2.0 * (os.cpu_count() or 1)  # estimated seconds of in-request work at once
+app.config['INLINE_MAX_COST'] = 60.0    # in-request work estimated above this is refused outright
+app.config['JOB_COST_BUDGET'] = 10 * 60  # estimated seconds of job work running at once, across all web workers
+app.config['JOB_MAX_BACKLOG'] = 30 * 60  # estimated seconds queued before new jobs are turned away
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('HIDENSEEK_PROFILE_SAMPLE', 0))  # share of requests profiled
+app.config['PROFILE_SLOW_SECONDS'] = 2.0   # profiled requests slower than this are dumped
+app.config['PROFILE_DIR'] = os.path.join(UPLOAD_FOLDER, 'profiles')
+
+# media backends (and Pillow/numpy/OpenCV/cryptography behind them) load on first
+# use; HIDENSEEK_PRELOAD=image,audio,video loads them now, see gunicorn.conf.py
+image_backend = backends.get('image')
+if os.environ.get('HIDENSEEK_PRELOAD'):
+    backends.preload(os.environ['HIDENSEEK_PRELOAD'])
+
+# uploads and results handed to background jobs, keyed by SHA-256, see store.py;
+# the job queue keeps its jobs' inputs touched, so a long wait never evicts them
+store = BlobStore(os.path.join(UPLOAD_FOLDER, 'store'), max_bytes=app.config['STORE_MAX_BYTES'],
+                  max_age=app.config['STORE_MAX_AGE'], grace=app.config['JOB_TIMEOUT'])
+
+# raw (pre-decryption) payloads keyed by (media, carrier sha256, raw), see cache.py
+extraction_cache = ExtractionCache(app.config['EXTRACT_CACHE_BYTES'])
+
+def _cache_payload(key, result: dict):
+    payload = result.pop('payload', None)
+    if payload is not None:
+        extraction_cache.put(key, payload)
+
+def _cache_metrics():
+    stats = extraction_cache.stats()
+    for key in ('hits', 'misses', 'evictions'):
+        yield f'hidenseek_extract_cache_{key}_total', 'counter', f'Extraction cache {key}.', {}, stats[key]
+    yield 'hidenseek_extract_cache_entries', 'gauge', 'Payloads held in the extraction cache.', {}, stats['entries']
+    yield 'hidenseek_extract_cache_bytes', 'gauge', 'Bytes held in the extraction cache.', {}, stats['bytes']
+
+metrics.register_collector(_cache_metrics)
+
+# audio/video work runs in background processes, see jobs.py
+jobs = JobQueue(os.path.join(UPLOAD_FOLDER, 'jobs'), max_workers=app.config['JOB_WORKERS'],
+                timeout=app.config['JOB_TIMEOUT'], max_cost=app.config['JOB_COST_BUDGET'])
+
+# carriers are probed (headers only) and costed before any heavy work, see admission.py
+inline_limiter = admission.CostLimiter(app.config['INLINE_COST_BUDGET'], app.config['INLINE_MAX_COST'])
+
+def _embed_inline(kind: str, stream, out, message, password: str = None):
+    # an oversized message or an overloaded server is refused before decoding or the KDF
+    info = admission.probe(kind, stream)
+    admission.check_fits(info, message, password)
+    with inline_limiter.admit(info['embed_cost']):
+        message, compression = backends.seal(message, password)
+        backends.get(kind).embed(stream, out, message, compression=compression)
+
+def _extract_inline(kind: str, stream, raw: bool):
+    info = admission.probe(kind, stream)
+    with inline_limiter.admit(info['extract_cost']):
+        return backends.get(kind).extract(stream, raw=raw)
+
+def _admit_job(cost: float):
+    if cost > app.config['JOB_TIMEOUT']:
+        raise admission.Rejected(f"This file is too large to process (estimated {cost:.0f}s of work)")
+    backlog = jobs.backlog()
+    if backlog and backlog + cost > app.config['JOB_MAX_BACKLOG']:
+        raise admission.Busy(admission.BUSY)
+
+@app.errorhandler(admission.Rejected)
+@app.errorhandler(admission.Busy)
+def _not_admitted(e):
+    busy = isinstance(e, admission.Busy)
+    if request.path.startswith('/api/'):
+        return jsonify({'error': str(e)}), 503 if busy else 413, {'Retry-After': '30'} if busy else {}
+    flash(str(e), 'danger')
+    return redirect(request.url)
+
+# bulk API work fans out over a process pool, see batch.py; items are admitted one by one
+batch = BatchRunner(app.config['BATCH_WORKERS'])
+batch_limiter = admission.CostLimiter(app.config['BATCH_COST_BUDGET'], app.config['INLINE_MAX_COST'])
+
+def _spooled():
+    return tempfile.SpooledTemporaryFile(max_size=app.config['SPOOL_MAX_BYTES'])
+
+def _upload_size(file) -> int:
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def _send_result(buf, filename: str, mimetype: str):
+    # stream the result back in this response; send_file closes the buffer afterwards
+    buf.seek(0)
+    return send_file(buf, as_attachment=True, download_name=filename, mimetype=mimetype)
+
+#  Request timing; stage timers in the modules pick up these labels, see metrics.py
+@app.before_request
+def _start_timing():
+    endpoint = request.endpoint or 'unknown'
+    media = endpoint.rsplit('_', 1)[-1]
+    g.metrics_token = metrics.bind(endpoint, media if media in backends.KINDS else 'none')
+    g.started = time.perf_counter()
+    g.profile = metrics.start_profile(app.config['PROFILE_SAMPLE_RATE'])
+    if request.method == 'POST':
+        with metrics.stage('upload'):
+            request.files  # parses (and spools) the multipart body
+
+@app.after_request
+def _finish_timing(response):
+    started = g.get('started')
+    if started is None:
+        return response
+    route, media = metrics.current()
+    observe = partial(metrics.observe, 'hidenseek_request_seconds', route=route, media=media,
+                      method=request.method, status=str(response.status_code))
+    elapsed = time.perf_counter() - started
+    if response.is_streamed:
+        # the body (e.g. a batch's pool work) is generated after this hook, so
+        # the request is timed when the server closes the response instead
+        response.call_on_close(lambda: observe(time.perf_counter() - started))
+    else:
+        observe(elapsed)
+    prof = g.pop('profile', None)
+    if prof is not None:
+        path = metrics.finish_profile(prof, elapsed, app.config['PROFILE_SLOW_SECONDS'], app.config['PROFILE_DIR'],
+                                      request.endpoint or 'unknown')
+        if path:
+            response.headers['X-Profile-Dump'] = os.path.basename(path)
+    return response
+
+@app.teardown_request
+def _release_timing(exc):
+    # also runs when a view raised, so the profiler and labels are always released
+    prof = g.pop('profile', None)
+    if prof is not None:
+        metrics.finish_profile(prof, time.perf_counter() - g.started, app.config['PROFILE_SLOW_SECONDS'],
+                               app.config['PROFILE_DIR'], request.endpoint or 'unknown')
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        metrics.unbind(token)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 #  Home 
 @app.route('/')
@@ -46,22 +197,18 @@ def embed_text_image():
             flash('Please enter a message to embed.', 'danger'); return redirect(request.url)
 
         filename = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], "ti_in_" + filename)
-        file.save(in_path)
 
-        if use_encrypt:
-            if not password:
-                flash('Password required for encryption.', 'danger'); return redirect(request.url)
-            message = encrypt_message(message, password)
+        if use_encrypt and not password:
+            flash('Password required for encryption.', 'danger'); return redirect(request.url)
 
         out_filename = f"hidenseek_img_{filename.rsplit('.',1)[0]}.png"
-        out_path = os.path.join(app.config['UPLOAD_FOLDER'], out_filename)
-        try: embed_text_in_image(in_path, out_path, message)
+        out = _spooled()
+        try: _embed_inline('image', file.stream, out, message, password if use_encrypt else None)
         except Exception as e:
+            out.close()
             flash(f"Embedding failed: {e}", 'danger'); return redirect(request.url)
 
-        flash('Message embedded into image! Download below.', 'success')
-        return render_template('embed_text_image.html', download=url_for('download_file', filename=out_filename))
+        return _send_result(out, out_filename, 'image/png')
     return render_template('embed_text_image.html')
 
 @app.route('/text-image/extract', methods=['GET', 'POST'])
@@ -74,69 +221,58 @@ def extract_text_image():
         if not file or file.filename == '':
             flash('Please select an image file.', 'danger'); return redirect(request.url)
 
-        filename = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], "ti_ex_" + filename)
-        file.save(in_path)
-
-        try: hidden = extract_text_from_image(in_path)
+        key = ('image', content_digest(file.stream), use_encrypt)
+        try: hidden = extraction_cache.get_or_extract(key, lambda: _extract_inline('image', file.stream, use_encrypt))
         except Exception as e:
             flash(f"Extraction failed: {e}", 'danger'); return redirect(request.url)
 
         if use_encrypt:
             if not password:
                 flash('Password required for decryption.', 'danger'); return redirect(request.url)
-            try: hidden = decrypt_message(hidden, password)
-            except Exception:
-                flash('Decryption failed: wrong password or corrupted data.', 'danger'); return redirect(request.url)
+            try: hidden = backends.unseal(hidden, password)
+            except ValueError as e:
+                flash(str(e), 'danger'); return redirect(request.url)
 
         return render_template('extract_text_image.html', extracted=hidden)
     return render_template('extract_text_image.html')
 
 # - Image -> Image 
+def _image_ext(data: bytes):
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.format.lower()
+    except Exception:
+        return None
+
 @app.route('/image-image/embed', methods=['GET', 'POST'])
 def embed_image_image():
     if request.method == 'POST':
         cover = request.files.get('cover')
         secret = request.files.get('secret')
+        stego = image_backend.module
+        fmt = request.form.get('format', 'png')
+        quality = request.form.get('quality', 85, type=int)
         if not cover or cover.filename == '' or not secret or secret.filename == '':
             flash('Please select both cover and secret images.', 'danger'); return redirect(request.url)
+        if fmt not in stego.SECRET_FORMATS or not 1 <= quality <= 100:
+            flash('Unsupported secret image format.', 'danger'); return redirect(request.url)
 
         cover_name = secure_filename(cover.filename)
-        secret_name = secure_filename(secret.filename)
-        cover_path = os.path.join(app.config['UPLOAD_FOLDER'], "ii_cover_" + cover_name)
-        secret_path = os.path.join(app.config['UPLOAD_FOLDER'], "ii_secret_" + secret_name)
-        cover.save(cover_path); secret.save(secret_path)
-
-        cover_img = Image.open(cover_path).convert('RGB')
-        cover_capacity_bits = cover_img.width * cover_img.height * 3
-
-        secret_img = Image.open(secret_path).convert('RGBA')
-
-        def encode_secret(img):
-            buf = io.BytesIO()
-            img.save(buf, format='PNG')
-            return base64.b64encode(buf.getvalue()).decode()
-
-        b64 = encode_secret(secret_img)
-        needed_bits = len(b64) * 8
-
-        # auto-resize until fits
-        while needed_bits > cover_capacity_bits:
-            new_w, new_h = int(secret_img.width * 0.9), int(secret_img.height * 0.9)
-            if new_w < 1 or new_h < 1:
-                flash("Secret image too small to embed.", 'danger'); return redirect(request.url)
-            secret_img = secret_img.resize((new_w, new_h), Image.LANCZOS)
-            b64 = encode_secret(secret_img)
-            needed_bits = len(b64) * 8
 
+        from PIL import Image
+        info = admission.probe('image', cover.stream)
         out_filename = f"hidenseek_imgimg_{cover_name.rsplit('.',1)[0]}.png"
-        out_path = os.path.join(app.config['UPLOAD_FOLDER'], out_filename)
-        try: embed_text_in_image(cover_path, out_path, b64)
+        out = _spooled()
+        try:
+            with inline_limiter.admit(info['embed_cost']):
+                data = stego.fit_secret(Image.open(secret.stream).convert('RGBA'), info['capacity_bytes'], fmt, quality)
+                image_backend.embed(cover.stream, out, data, compression='none')  # already PNG/WebP
         except Exception as e:
+            out.close()
             flash(f"Embedding failed: {e}", 'danger'); return redirect(request.url)
 
-        flash('Secret image embedded into cover image! (resized if needed)', 'success')
-        return render_template('embed_image_image.html', download=url_for('download_file', filename=out_filename))
+        return _send_result(out, out_filename, 'image/png')
     return render_template('embed_image_image.html')
 
 @app.route('/image-image/extract', methods=['GET', 'POST'])
@@ -147,22 +283,23 @@ def extract_image_image():
             flash('Please select the stego image.', 'danger'); return redirect(request.url)
 
         cover_name = secure_filename(cover.filename)
-        cover_path = os.path.join(app.config['UPLOAD_FOLDER'], "ii_ex_" + cover_name)
-        cover.save(cover_path)
 
-        try: b64 = extract_text_from_image(cover_path)
+        try: raw = _extract_inline('image', cover.stream, True)
         except Exception as e:
             flash(f"Extraction failed: {e}", 'danger'); return redirect(request.url)
 
         try:
-            raw = base64.b64decode(b64)
-            out_filename = f"hidenseek_revealed_{cover_name.rsplit('.',1)[0]}.png"
-            out_path = os.path.join(app.config['UPLOAD_FOLDER'], out_filename)
-            with open(out_path, 'wb') as f: f.write(raw)
+            ext = _image_ext(raw)
+            if ext is None:  # carriers from before raw embedding hold base64 PNG text
+                raw = base64.b64decode(raw, validate=True)
+                ext = _image_ext(raw)
+            if ext is None:
+                raise ValueError
         except Exception:
             flash('Extracted data is not a valid embedded image.', 'danger'); return redirect(request.url)
 
-        return render_template('extract_image_image.html', download=url_for('download_file', filename=out_filename))
+        out_filename = f"hidenseek_revealed_{cover_name.rsplit('.',1)[0]}.{ext}"
+        return _send_result(io.BytesIO(raw), out_filename, f'image/{ext}')
     return render_template('extract_image_image.html')
 
 #  Text -> Audio 
@@ -182,22 +319,25 @@ def embed_text_audio():
             flash('Only WAV files are supported.', 'danger'); return redirect(request.url)
 
         filename = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], "ta_in_" + filename)
-        file.save(in_path)
-
-        if use_encrypt:
-            if not password:
-                flash('Password required for encryption.', 'danger'); return redirect(request.url)
-            message = encrypt_message(message, password)
+        if use_encrypt and not password:
+            flash('Password required for encryption.', 'danger'); return redirect(request.url)
 
         out_filename = f"hidenseek_audio_{filename.rsplit('.',1)[0]}.wav"
-        out_path = os.path.join(app.config['UPLOAD_FOLDER'], out_filename)
-        try: embed_text_in_wav(in_path, out_path, message)
-        except Exception as e:
-            flash(f"Embedding failed: {e}", 'danger'); return redirect(request.url)
-
-        flash('Message embedded into audio!', 'success')
-        return render_template('embed_text_audio.html', download=url_for('download_file', filename=out_filename))
+        if _upload_size(file) <= app.config['INLINE_AUDIO_BYTES']:
+            out = _spooled()
+            try: _embed_inline('audio', file.stream, out, message, password if use_encrypt else None)
+            except Exception as e:
+                out.close()
+                flash(f"Embedding failed: {e}", 'danger'); return redirect(request.url)
+            return _send_result(out, out_filename, 'audio/wav')
+
+        in_path = store.path(store.put(file.stream))
+        info = admission.probe('audio', in_path)
+        admission.check_fits(info, message, password if use_encrypt else None)
+        _admit_job(info['embed_cost'])
+        job = jobs.submit(embed_task, 'audio', in_path, store.root, out_filename, message,
+                          password if use_encrypt else None, cost=info['embed_cost'], inputs=(in_path,))
+        return redirect(url_for('job_status', job_id=job.id, key=job.key))
     return render_template('embed_text_audio.html')
 
 @app.route('/text-audio/extract', methods=['GET', 'POST'])
@@ -210,21 +350,31 @@ def extract_text_audio():
         if not file or file.filename == '':
             flash('Please select a WAV file.', 'danger'); return redirect(request.url)
 
-        filename = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], "ta_ex_" + filename)
-        file.save(in_path)
-
-        try: hidden = extract_text_from_wav(in_path)
-        except Exception as e:
-            flash(f"Extraction failed: {e}", 'danger'); return redirect(request.url)
+        if use_encrypt and not password:
+            flash('Password required for decryption.', 'danger'); return redirect(request.url)
+
+        if _upload_size(file) <= app.config['INLINE_AUDIO_BYTES']:
+            key = ('audio', content_digest(file.stream), use_encrypt)
+            try: hidden = extraction_cache.get_or_extract(key, lambda: _extract_inline('audio', file.stream, use_encrypt))
+            except Exception as e:
+                flash(f"Extraction failed: {e}", 'danger'); return redirect(request.url)
+        else:
+            digest = store.put(file.stream)
+            key = ('audio', digest, use_encrypt)
+            hidden = extraction_cache.get(key)
+            if hidden is None:
+                in_path = store.path(digest)
+                info = admission.probe('audio', in_path)
+                _admit_job(info['extract_cost'])
+                job = jobs.submit(extract_task, 'audio', in_path, password if use_encrypt else None,
+                                  keep_payload=True, on_done=partial(_cache_payload, key), cost=info['extract_cost'],
+                                  private=('extracted',), inputs=(in_path,))
+                return redirect(url_for('job_status', job_id=job.id, key=job.key))
 
         if use_encrypt:
-            if not password:
-                flash('Password required for decryption.', 'danger'); return redirect(request.url)
-            try: hidden = decrypt_message(hidden, password)
-            except Exception:
-                flash('Decryption failed: wrong password or corrupted data.', 'danger'); return redirect(request.url)
-
+            try: hidden = backends.unseal(hidden, password)
+            except ValueError as e:
+                flash(str(e), 'danger'); return redirect(request.url)
         return render_template('extract_text_audio.html', extracted=hidden)
     return render_template('extract_text_audio.html')
 
@@ -236,29 +386,26 @@ def embed_text_video():
         message = request.form.get('message', '').strip()
         use_encrypt = request.form.get('encrypt') == 'on'
         password = request.form.get('password', '')
+        lossless = request.form.get('lossless') == 'on'
 
         if not file or file.filename == '':
             flash('Please select a video file.', 'danger'); return redirect(request.url)
         if not message:
             flash('Please enter a message.', 'danger'); return redirect(request.url)
 
-        filename = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], "tv_in_" + filename)
-        file.save(in_path)
-
-        if use_encrypt:
-            if not password:
-                flash('Password required for encryption.', 'danger'); return redirect(request.url)
-            message = encrypt_message(message, password)
+        if use_encrypt and not password:
+            flash('Password required for encryption.', 'danger'); return redirect(request.url)
 
+        filename = secure_filename(file.filename)
         out_filename = f"hidenseek_video_{filename.rsplit('.',1)[0]}.avi"
-        out_path = os.path.join(app.config['UPLOAD_FOLDER'], out_filename)
-        try: embed_text_in_video(in_path, out_path, message)
-        except Exception as e:
-            flash(f"Embedding failed: {e}", 'danger'); return redirect(request.url)
-
-        flash('Message embedded into video!', 'success')
-        return render_template('embed_text_video.html', download=url_for('download_file', filename=out_filename))
+        in_path = store.path(store.put(file.stream))
+        info = admission.probe('video', in_path)
+        admission.check_fits(info, message, password if use_encrypt else None)
+        _admit_job(info['embed_cost'])
+        job = jobs.submit(embed_task, 'video', in_path, store.root, out_filename, message,
+                          password if use_encrypt else None, lossless=lossless, cost=info['embed_cost'],
+                          inputs=(in_path,))
+        return redirect(url_for('job_status', job_id=job.id, key=job.key))
     return render_template('embed_text_video.html')
 
 @app.route('/text-video/extract', methods=['GET', 'POST'])
@@ -271,31 +418,143 @@ def extract_text_video():
         if not file or file.filename == '':
             flash('Please select a video file.', 'danger'); return redirect(request.url)
 
-        filename = secure_filename(file.filename)
-        in_path = os.path.join(app.config['UPLOAD_FOLDER'], "tv_ex_" + filename)
-        file.save(in_path)
-
-        try: hidden = extract_text_from_video(in_path)
-        except Exception as e:
-            flash(f"Extraction failed: {e}", 'danger'); return redirect(request.url)
+        if use_encrypt and not password:
+            flash('Password required for decryption.', 'danger'); return redirect(request.url)
+
+        digest = store.put(file.stream)
+        key = ('video', digest, use_encrypt)
+        hidden = extraction_cache.get(key)
+        if hidden is None:
+            in_path = store.path(digest)
+            info = admission.probe('video', in_path)
+            _admit_job(info['extract_cost'])
+            job = jobs.submit(extract_task, 'video', in_path, password if use_encrypt else None,
+                              keep_payload=True, on_done=partial(_cache_payload, key), cost=info['extract_cost'],
+                              private=('extracted',), inputs=(in_path,))
+            return redirect(url_for('job_status', job_id=job.id, key=job.key))
 
         if use_encrypt:
-            if not password:
-                flash('Password required for decryption.', 'danger'); return redirect(request.url)
-            try: hidden = decrypt_message(hidden, password)
-            except Exception:
-                flash('Decryption failed: wrong password or corrupted data.', 'danger'); return redirect(request.url)
-
+            try: hidden = backends.unseal(hidden, password)
+            except ValueError as e:
+                flash(str(e), 'danger'); return redirect(request.url)
         return render_template('extract_text_video.html', extracted=hidden)
     return render_template('extract_text_video.html')
 
+#  Background jobs
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    # private results (extracted text) are sealed under the key in the link the requester was sent
+    job = jobs.status(job_id, request.args.get('key'))
+    if job is None:
+        abort(404)
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        if job['status'] == 'done' and 'download' in (job['result'] or {}):
+            job['download_url'] = url_for('download_file', digest=job['result']['download'],
+                                          filename=job['result']['filename'])
+        return jsonify(job)
+    return render_template('job_status.html', job=job, key=request.args.get('key'), finished=job['status'] in FINISHED)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not jobs.cancel(job_id):
+        flash('Job is not running.', 'danger')
+    return redirect(url_for('job_status', job_id=job_id, key=request.args.get('key')))
+
+#  Batch API
+def _api_error(message: str, status: int = 400):
+    return jsonify({'error': message}), status
+
+def _batch_items(files, output, fn, extra, op: str, check=None):
+    # carriers go into the blob store up front: the request's upload files are
+    # closed before the streamed response body is generated. Each is probed
+    # first and costed for `op` ('embed' or 'extract'); check(info, index) may
+    # reject it further. Yields (record, fn, args, cost) for BatchRunner.run.
+    items, seen = [], set()
+    for index, file in enumerate(files):
+        name = secure_filename(file.filename) or f'item{index}'
+        record = {'index': index, 'filename': name}
+        kind = carrier_kind(name)
+        if kind is None:
+            record['error'] = 'Unsupported carrier type (batches take images and WAV files).'
+            items.append((record, None, None, 0.0))
+            continue
+        if output is not None:
+            out = output(kind, name.rsplit('.', 1)[0])
+            if out in seen:
+                out = f"{index}_{out}"
+            seen.add(out)
+            record['output'] = out
+        try:
+            info = admission.probe(kind, file.stream)
+            if check is not None:
+                check(info, index)
+        except admission.Rejected as e:
+            record['error'] = str(e)
+            items.append((record, None, None, 0.0))
+            continue
+        path = store.path(store.put(file.stream))
+        items.append((record, fn, (kind, path, *extra(index)), info[f'{op}_cost']))
+    return items
+
+def _batch_response(records, fmt: str):
+    if fmt == 'zip':
+        return Response(stream_with_context(to_zip(records)), mimetype='application/zip',
+                        headers={'Content-Disposition': 'attachment; filename=hidenseek_batch.zip'})
+    return Response(stream_with_context(to_ndjson(records)), mimetype='application/x-ndjson')
+
+@app.route('/api/v1/batch/embed', methods=['POST'])
+def batch_embed():
+    files = [f for f in request.files.getlist('carrier') if f.filename]
+    messages = [m.strip() for m in request.form.getlist('message')]
+    password = request.form.get('password') or None
+    compression = request.form.get('compression', 'auto')
+    fmt = request.values.get('format', 'zip')
+
+    if not files:
+        return _api_error("Upload one or more 'carrier' files.")
+    if len(messages) not in (1, len(files)) or not all(messages):
+        return _api_error("Send one 'message' for the whole batch or one per carrier.")
+    if compression != 'auto' and compression not in CODECS:
+        return _api_error(f"Unknown compression {compression!r}.")
+    if fmt not in ('zip', 'ndjson'):
+        return _api_error("format must be 'zip' or 'ndjson'.")
+
+    message_for = lambda i: messages[i if len(messages) > 1 else 0]
+    items = _batch_items(files, lambda kind, stem: OUTPUT_NAMES[kind].format(stem), embed_item,
+                         lambda i: (message_for(i), password, compression), 'embed',
+                         lambda info, i: admission.check_fits(info, message_for(i), password, compression))
+    return _batch_response(batch.run(items, batch_limiter), fmt)
+
+@app.route('/api/v1/batch/extract', methods=['POST'])
+def batch_extract():
+    files = [f for f in request.files.getlist('carrier') if f.filename]
+    password = request.form.get('password') or None
+    fmt = request.values.get('format', 'ndjson')
+
+    if not files:
+        return _api_error("Upload one or more 'carrier' files.")
+    if fmt not in ('zip', 'ndjson'):
+        return _api_error("format must be 'zip' or 'ndjson'.")
+
+    items = _batch_items(files, lambda kind, stem: f"{stem}.txt", extract_item, lambda i: (password,), 'extract')
+    return _batch_response(batch.run(items, batch_limiter), fmt)
+
+@app.route('/api/v1/batch/scan', methods=['POST'])
+def batch_scan():
+    # screens carriers for hidden payloads without extracting them; NDJSON only
+    files = [f for f in request.files.getlist('carrier') if f.filename]
+    if not files:
+        return _api_error("Upload one or more 'carrier' files.")
+    items = _batch_items(files, None, scan_item, lambda i: (), 'extract')  # a scan reads no more than an extract
+    return _batch_response(batch.run(items, batch_limiter), 'ndjson')
+
 # --File Download
-@app.route('/download/<path:filename>')
-def download_file(filename):
-    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(path):
-        flash('File not found.', 'danger'); return redirect(url_for('home'))
-    return send_file(path, as_attachment=True)
+@app.route('/download/<digest>/<filename>')
+def download_file(digest, filename):
+    path = store.path(digest)
+    if path is None:
+        flash('File not found or expired.', 'danger'); return redirect(url_for('home'))
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=secure_filename(filename))
 
 if __name__ == "__main__":
     app.run(debug=True)
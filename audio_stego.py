@@ -1,62 +1,84 @@
-
 # audio_stego.py
 # LSB steganography for 16-bit PCM WAV files
-import wave
+# Audio is processed in fixed-size frame chunks, so peak memory is bounded by
+# the chunk size rather than the file size.
+import time, wave
 import numpy as np
+from metrics import stage, observe_stage
+import bitcodec
+from utils import frame_payload, StreamDecoder
 
-DELIM = '0' * 16  # same delimiter as image stego
-
-def _str_to_bits(s: str) -> str:
-    return ''.join(f'{ord(c):08b}' for c in s)
-
-def _bits_to_str(b: str) -> str:
-    chars = [b[i:i+8] for i in range(0, len(b), 8)]
-    return ''.join(chr(int(byte, 2)) for byte in chars)
+CHUNK_FRAMES = 64 * 1024
 
 def _ensure_capacity(num_samples: int, bits_len: int) -> bool:
     return bits_len <= num_samples
 
-def embed_text_in_wav(in_wav: str, out_wav: str, message: str):
-    with wave.open(in_wav, 'rb') as wf:
-        if wf.getsampwidth() != 2:
-            raise ValueError("Only 16-bit PCM WAV is supported")
-        params = wf.getparams()
-        frames = wf.readframes(wf.getnframes())
-
-    # Convert to numpy int16 array
-    samples = np.frombuffer(frames, dtype=np.int16).copy()
+def _open_pcm16(src):
+    # src is a path or a seekable binary file object
+    if hasattr(src, 'seek'):
+        src.seek(0)
+    wf = wave.open(src, 'rb')
+    if wf.getsampwidth() != 2:
+        wf.close()
+        raise ValueError("Only 16-bit PCM WAV is supported")
+    return wf
 
-    bits = _str_to_bits(message) + DELIM
-    if not _ensure_capacity(samples.size, len(bits)):
-        raise ValueError("Audio doesn't have enough capacity for message")
+def probe(src) -> dict:
+    with _open_pcm16(src) as wf:
+        params = wf.getparams()
+    samples = params.nframes * params.nchannels
+    return {'channels': params.nchannels, 'rate': params.framerate,
+            'seconds': params.nframes / params.framerate if params.framerate else 0.0,
+            'units': samples, 'capacity_bits': samples}
 
-    # Embed into LSB of samples
-    bit_idx = 0
-    for i in range(samples.size):
-        if bit_idx >= len(bits):
-            break
-        samples[i] = (samples[i] & ~1) | int(bits[bit_idx])
-        bit_idx += 1
+def embed_text_in_wav(in_wav: str, out_wav: str, message, chunk_frames: int = CHUNK_FRAMES,
+                      compression: str = 'auto'):
+    with stage('frame'):
+        bits = bitcodec.encode(frame_payload(message, compression))
+    timings = {'decode': 0.0, 'lsb': 0.0, 'encode': 0.0}
+    with _open_pcm16(in_wav) as wf:
+        params = wf.getparams()
+        if not _ensure_capacity(params.nframes * params.nchannels, bits.size):
+            raise ValueError("Audio doesn't have enough capacity for message")
 
-    # Write back
-    with wave.open(out_wav, 'wb') as out:
-        out.setparams(params)
-        out.writeframes(samples.tobytes())
+        with wave.open(out_wav, 'wb') as out:
+            out.setparams(params)
+            pos = 0
+            while True:
+                t0 = time.perf_counter()
+                frames = wf.readframes(chunk_frames)
+                t1 = time.perf_counter()
+                timings['decode'] += t1 - t0
+                if not frames:
+                    break
+                if pos < bits.size:
+                    # Embed into LSB of samples; chunks past the payload are copied through
+                    samples = np.frombuffer(frames, dtype=np.int16).copy()
+                    n = min(samples.size, bits.size - pos)
+                    bitcodec.write_lsb(samples[:n], bits[pos:pos + n])
+                    pos += n
+                    frames = samples.tobytes()
+                t2 = time.perf_counter()
+                out.writeframes(frames)
+                timings['lsb'] += t2 - t1
+                timings['encode'] += time.perf_counter() - t2
 
+    for name, seconds in timings.items():
+        observe_stage(name, seconds)
     return out_wav
 
-def extract_text_from_wav(wav_path: str) -> str:
-    with wave.open(wav_path, 'rb') as wf:
-        if wf.getsampwidth() != 2:
-            raise ValueError("Only 16-bit PCM WAV is supported")
-        frames = wf.readframes(wf.getnframes())
-
-    samples = np.frombuffer(frames, dtype=np.int16)
-    bits = ''.join(str(int(s & 1)) for s in samples)
-
-    if DELIM in bits:
-        bits = bits.split(DELIM)[0]
-    else:
-        raise ValueError("No hidden message found (delimiter missing)")
+def _sample_lsbs(wf, chunk_frames: int):
+    while True:
+        frames = wf.readframes(chunk_frames)
+        if not frames:
+            return
+        yield bitcodec.read_lsb(np.frombuffer(frames, dtype=np.int16))
 
-    return _bits_to_str(bits)
+def extract_text_from_wav(wav_path: str, chunk_frames: int = CHUNK_FRAMES, raw: bool = False):
+    # raw=True returns the payload bytes instead of decoding them as text
+    with stage('scan'), _open_pcm16(wav_path) as wf:
+        decoder = StreamDecoder(wf.getnframes() * wf.getnchannels())
+        for lsbs in _sample_lsbs(wf, chunk_frames):
+            if decoder.feed(lsbs):
+                break
+    return decoder.finish(raw)
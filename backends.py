@@ -0,0 +1,98 @@
+# backends.py
+# Registry of stego backends by media type. A backend's module is imported on
+# first use, so a process that only handles images never loads OpenCV. preload()
+# imports them up front instead, e.g. in a gunicorn master started with
+# preload_app, so the forked workers share those pages (see gunicorn.conf.py).
+import importlib, os
+
+class Backend:
+    def __init__(self, kind: str, module: str, embed: str, extract: str, probe: str, extensions: tuple):
+        self.kind = kind
+        self.extensions = extensions
+        self._module_name = module
+        self._embed, self._extract, self._probe = embed, extract, probe
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def embed(self, *args, **kwargs):
+        return getattr(self.module, self._embed)(*args, **kwargs)
+
+    def extract(self, *args, **kwargs):
+        return getattr(self.module, self._extract)(*args, **kwargs)
+
+    def probe(self, src) -> dict:
+        # header-only capacity/size read, see admission.py
+        return getattr(self.module, self._probe)(src)
+
+_REGISTRY = {}
+
+def register(kind: str, module: str, embed: str, extract: str, probe: str, extensions: tuple) -> Backend:
+    _REGISTRY[kind] = backend = Backend(kind, module, embed, extract, probe, extensions)
+    return backend
+
+register('image', 'stego', 'embed_message', 'extract_message', 'probe',
+         ('.png', '.bmp', '.tif', '.tiff', '.jpg', '.jpeg', '.webp', '.gif'))
+register('audio', 'audio_stego', 'embed_text_in_wav', 'extract_text_from_wav', 'probe', ('.wav',))
+register('video', 'video_stego', 'embed_text_in_video', 'extract_text_from_video', 'probe',
+         ('.avi', '.mp4', '.mov', '.mkv'))
+
+KINDS = tuple(_REGISTRY)
+
+def get(kind: str) -> Backend:
+    try:
+        return _REGISTRY[kind]
+    except KeyError:
+        raise ValueError(f"Unknown media type {kind!r}") from None
+
+def kind_for(filename: str):
+    # media type by file extension, or None if no backend handles it
+    ext = os.path.splitext(filename)[1].lower()
+    for kind, backend in _REGISTRY.items():
+        if ext in backend.extensions:
+            return kind
+    return None
+
+#  Payloads
+# Every front end (routes, jobs, batches, the CLI) seals and reveals messages
+# through these, so a payload format change is made here only.
+DECRYPT_FAILED = 'Decryption failed: wrong password or corrupted data.'
+
+def seal(message, password: str = None, compression: str = 'auto'):
+    # (payload, compression) to embed; with a password the message is encrypted,
+    # and ciphertext never compresses
+    if not password:
+        return message, compression
+    from security import encrypt_bytes
+    return encrypt_bytes(message, password), 'none'
+
+def unseal(payload, password: str) -> str:
+    # decrypts an extracted payload; any failure becomes ValueError(DECRYPT_FAILED)
+    from security import decrypt_message
+    try:
+        return decrypt_message(payload, password)
+    except Exception:
+        raise ValueError(DECRYPT_FAILED) from None
+
+def reveal(kind: str, src, password: str = None) -> str:
+    # extracts the hidden message, decrypting it when a password is given
+    payload = get(kind).extract(src, raw=bool(password))
+    return unseal(payload, password) if password else payload
+
+def preload(kinds=None) -> list:
+    # kinds: iterable or comma-separated string; None or 'all' loads every backend
+    if kinds is None or kinds == 'all':
+        kinds = KINDS
+    elif isinstance(kinds, str):
+        kinds = [k.strip() for k in kinds.split(',') if k.strip()]
+    for kind in kinds:
+        get(kind).module
+    return [kind for kind in KINDS if _REGISTRY[kind].loaded]
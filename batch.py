@@ -0,0 +1,164 @@
+# batch.py
+# Bulk embed/extract behind the JSON API. Items fan out over a process pool sized
+# to the cores and come back in submission order. Carriers are handed over as
+# paths, and only a bounded window of items is in flight, so a large batch's
+# results are never all held in memory. A failing item turns into an error
+# record; the rest of the batch carries on.
+import base64, collections, io, json, multiprocessing, os, threading, zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import admission, backends
+
+# video stays on the job queue; batches are for many small carriers
+OUTPUT_NAMES = {'image': 'hidenseek_img_{}.png', 'audio': 'hidenseek_audio_{}.wav'}
+
+def carrier_kind(filename: str):
+    kind = backends.kind_for(filename)
+    return kind if kind in OUTPUT_NAMES else None
+
+#  Tasks (run inside the pool's worker processes)
+def _load(path: str):
+    # images are decoded from memory so PIL's errors don't name the store path
+    with open(path, 'rb') as f:
+        return io.BytesIO(f.read())
+
+def embed_item(kind: str, in_path: str, message: str, password: str = None, compression: str = 'auto') -> bytes:
+    message, compression = backends.seal(message, password, compression)
+    out = io.BytesIO()
+    backends.get(kind).embed(_load(in_path) if kind == 'image' else in_path, out, message,
+                             compression=compression)
+    return out.getvalue()
+
+def extract_item(kind: str, in_path: str, password: str = None) -> str:
+    return backends.reveal(kind, _load(in_path) if kind == 'image' else in_path, password)
+
+def scan_item(kind: str, in_path: str) -> dict:
+    from scanner import scan
+    return scan(kind, _load(in_path) if kind == 'image' else in_path)
+
+#  Runner
+class BatchRunner:
+    def __init__(self, workers: int = None, window: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window or 2 * self.workers  # items submitted ahead of the one being returned
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, args):
+        # the pool is created on first use, and replaced if a worker died and broke it
+        for _ in range(2):
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                pool = self._pool
+            try:
+                return pool.submit(fn, *args)
+            except BrokenProcessPool:
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+        raise BrokenProcessPool('Batch worker pool keeps failing')
+
+    def run(self, items, limiter=None):
+        # items yield (record, fn, args, cost); a record that already holds an
+        # 'error' is passed through untouched. Yields each record with 'ok' and
+        # either 'result' or 'error' filled in. With a CostLimiter, each item's
+        # estimated cost is admitted before it is submitted: the batch waits for
+        # its own items in flight, and an item that finds the budget held by
+        # other requests alone fails as busy.
+        pending = collections.deque()
+        try:
+            for record, fn, args, cost in items:
+                future, held = None, 0.0
+                if 'error' not in record:
+                    try:
+                        if limiter is not None:
+                            while not limiter.acquire(cost):
+                                if not pending:
+                                    raise admission.Busy(admission.BUSY)
+                                yield _collect(*pending.popleft(), limiter)
+                            held = cost
+                        future = self._submit(fn, args)
+                    except Exception as e:
+                        record['error'] = str(e) or e.__class__.__name__
+                        if held:
+                            limiter.release(held)
+                            held = 0.0
+                pending.append((record, future, held))
+                if len(pending) >= self.window:
+                    yield _collect(*pending.popleft(), limiter)
+            while pending:
+                yield _collect(*pending.popleft(), limiter)
+        finally:
+            for _, future, held in pending:  # client went away mid-stream
+                if future is not None:
+                    future.cancel()
+                    if held:  # released once the pool is done with it
+                        future.add_done_callback(lambda _, cost=held: limiter.release(cost))
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+def _collect(record, future, held=0.0, limiter=None):
+    if future is not None:
+        try:
+            record['result'] = future.result()
+        except Exception as e:
+            record['error'] = str(e) or e.__class__.__name__
+        finally:
+            if held:
+                limiter.release(held)
+    record['ok'] = 'error' not in record
+    if not record['ok']:
+        record.pop('output', None)
+    return record
+
+#  Output formats
+def _line(record) -> dict:
+    line = {k: v for k, v in record.items() if k != 'result'}
+    result = record.get('result')
+    if isinstance(result, bytes):
+        line['data'] = base64.b64encode(result).decode('ascii')
+    elif isinstance(result, dict):
+        line.update(result)
+    elif result is not None:
+        line['extracted'] = result
+    return line
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(_line(record), ensure_ascii=False) + '\n'
+
+class _Sink:
+    # write-only file for ZipFile; zipfile falls back to data descriptors when it can't seek
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b''.join(self._chunks)
+        self._chunks.clear()
+        return out
+
+def to_zip(records):
+    # one member per successful item (carriers stored as-is, they don't deflate),
+    # then results.ndjson describing every item, failures included
+    sink, manifest = _Sink(), []
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as zf:
+        for record in records:
+            result = record.get('result')
+            if result is not None:
+                zf.writestr(record['output'], result)  # str members are written as UTF-8
+            manifest.append(json.dumps({k: v for k, v in record.items() if k != 'result'}, ensure_ascii=False))
+            yield sink.drain()
+        zf.writestr('results.ndjson', '\n'.join(manifest) + '\n', zipfile.ZIP_DEFLATED)
+    yield sink.drain()
@@ -0,0 +1,263 @@
+# bench.py
+# Reproducible benchmarks for the embed/extract paths. Synthetic covers are
+# generated from a fixed seed and cached in --workdir; every case runs in a
+# fresh process, so its peak RSS is its own. Results are written as JSON and can
+# be compared against a stored baseline:
+#
+#   python bench.py -o baseline.json
+#   python bench.py --baseline baseline.json --threshold 0.15   # exits 1 on a regression
+import argparse, fnmatch, json, multiprocessing, os, platform, statistics, sys, tempfile, time, wave
+from concurrent.futures import ProcessPoolExecutor
+
+PROFILES = {
+    # image sizes in megapixels, audio in seconds, video as (width, height, frames)
+    'quick': {'image': (0.3, 2), 'audio': (1, 60), 'video': ((320, 240, 10), (640, 480, 10)),
+              'payload': (16, 1024, 64 * 1024), 'repeat': 3},
+    'full': {'image': (0.3, 2, 12, 50), 'audio': (1, 60, 600, 1800),
+             'video': ((320, 240, 30), (640, 480, 30), (1280, 720, 30)),
+             'payload': (16, 1024, 64 * 1024, 1024 * 1024), 'repeat': 5},
+}
+SAMPLE_RATE = 44100
+PASSWORD = 'benchmark'
+
+#  Synthetic covers
+def _rng(seed: int, *salt):
+    import numpy as np
+    return np.random.default_rng([seed, *salt])
+
+def make_image(workdir: str, mp: float, seed: int) -> str:
+    path = os.path.join(workdir, f'image-{mp}mp-{seed}.png')
+    if not os.path.exists(path):
+        from PIL import Image
+        width = int((mp * 1e6 * 4 / 3) ** 0.5)
+        height = int(width * 3 / 4)
+        pixels = _rng(seed, 1, int(mp * 10)).integers(0, 256, (height, width, 3), dtype='uint8')
+        Image.fromarray(pixels).save(path, format='PNG', compress_level=1)
+    return path
+
+def make_wav(workdir: str, seconds: float, seed: int) -> str:
+    path = os.path.join(workdir, f'audio-{seconds}s-{seed}.wav')
+    if not os.path.exists(path):
+        rng = _rng(seed, 2, int(seconds))
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(2); wf.setsampwidth(2); wf.setframerate(SAMPLE_RATE)
+            left = int(seconds * SAMPLE_RATE)
+            while left:  # written in one-minute chunks so long covers don't sit in memory
+                n = min(left, 60 * SAMPLE_RATE)
+                wf.writeframes(rng.integers(-8000, 8000, n * 2, dtype='int16').tobytes())
+                left -= n
+    return path
+
+def make_video(workdir: str, size: tuple, seed: int) -> str:
+    width, height, frames = size
+    path = os.path.join(workdir, f'video-{width}x{height}x{frames}-{seed}.avi')
+    if not os.path.exists(path):
+        import cv2
+        rng = _rng(seed, 3, width)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), 25.0, (width, height))
+        for _ in range(frames):
+            writer.write(rng.integers(0, 256, (height, width, 3), dtype='uint8'))
+        writer.release()
+    return path
+
+def payload_text(size: int, seed: int) -> str:
+    # lowercase words: compresses about as well as real text, so 'auto' compression does real work
+    rng = _rng(seed, 4, size)
+    letters = rng.integers(0, 27, size)
+    return ''.join(' ' if c == 26 else chr(97 + c) for c in letters.tolist())
+
+#  Cases
+def build_cases(profile: dict, workdir: str, seed: int):
+    # (id, bench, cover path or None, cover label, payload size); payloads that
+    # don't fit a cover after framing are skipped
+    from utils import HEADER
+    from stego import payload_capacity
+    covers = [('image', make_image(workdir, mp, seed), f'{mp}MP') for mp in profile['image']]
+    covers += [('audio', make_wav(workdir, s, seed), f'{s}s') for s in profile['audio']]
+    covers += [('video', make_video(workdir, v, seed), '{}x{}x{}'.format(*v)) for v in profile['video']]
+    cases = []
+    for kind, cover, label in covers:
+        if kind == 'image':
+            capacity = payload_capacity(cover)
+        elif kind == 'audio':
+            with wave.open(cover) as wf:
+                capacity = wf.getnframes() * wf.getnchannels() // 8 - HEADER.size
+        else:
+            w, h, n = map(int, label.split('x'))
+            capacity = w * h * n // 8 - HEADER.size
+        for size in profile['payload']:
+            if size > capacity:
+                continue
+            for op in ('embed', 'extract'):
+                cases.append((f'{kind}.{op}/{label}/{size}B', f'{kind}.{op}', cover, label, size))
+        if kind == 'image':
+            cases.append((f'image.fit_secret/{label}', 'image.fit_secret', cover, label, 0))
+    for size in profile['payload']:
+        for op in ('encrypt', 'decrypt'):
+            cases.append((f'security.{op}/{size}B', f'security.{op}', None, '', size))
+    return cases
+
+def _status_mb(field: str) -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def _reset_peak_rss():
+    # Linux lets a process reset its own high-water mark; ru_maxrss can't be
+    # reset and even survives the exec that starts a spawned worker
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _peak_rss_mb() -> float:
+    peak = _status_mb('VmHWM')
+    if peak:
+        return peak
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _prepare(bench: str, cover: str, size: int, seed: int, scratch: str):
+    # returns (timed callable, bytes processed per call); untimed setup happens here
+    import backends
+    kind, op = bench.split('.')
+    message = payload_text(size, seed) if size else ''
+    if kind == 'security':
+        import security
+        if op == 'encrypt':
+            return (lambda: security.encrypt_bytes(message, PASSWORD)), size
+        token = security.encrypt_bytes(message, PASSWORD)
+        return (lambda: security.decrypt_message(token, PASSWORD)), size
+
+    backend = backends.get(kind)
+    nbytes = os.path.getsize(cover)
+    out = os.path.join(scratch, 'out' + ('.png' if kind == 'image' else '.wav' if kind == 'audio' else '.avi'))
+    opts = {'lossless': True} if kind == 'video' else {}
+    if op == 'fit_secret':
+        from PIL import Image
+        secret = Image.open(cover).convert('RGBA')
+        capacity = secret.width * secret.height * 3 // 8 // 4  # a cover a quarter the secret's size
+        return (lambda: backend.module.fit_secret(secret, capacity)), nbytes
+    if op == 'embed':
+        return (lambda: backend.embed(cover, out, message, **opts)), nbytes
+    backend.embed(cover, out, message, **opts)
+    return (lambda: backend.extract(out)), os.path.getsize(out)
+
+def run_case(bench: str, cover: str, size: int, seed: int, repeat: int) -> dict:
+    # runs in its own process; the first call warms caches and isn't counted
+    with tempfile.TemporaryDirectory(prefix='hidenseek-bench-') as scratch:
+        fn, nbytes = _prepare(bench, cover, size, seed, scratch)
+        base_rss = _status_mb('VmRSS')
+        _reset_peak_rss()
+        fn()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    wall = statistics.median(times)
+    return {'wall_s': wall, 'min_s': min(times), 'mb_s': nbytes / 1e6 / wall if wall else None,
+            'bytes': nbytes, 'base_rss_mb': round(base_rss, 1), 'peak_rss_mb': round(_peak_rss_mb(), 1)}
+
+def run(profile_name: str, workdir: str, seed: int, only=(), repeat: int = None, progress=True) -> dict:
+    profile = PROFILES[profile_name]
+    repeat = repeat or profile['repeat']
+    os.makedirs(workdir, exist_ok=True)
+    cases = [c for c in build_cases(profile, workdir, seed)
+             if not only or any(fnmatch.fnmatch(c[0], p) for p in only)]
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    for n, (case_id, bench, cover, label, size) in enumerate(cases, 1):
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            try:
+                result = pool.submit(run_case, bench, cover, size, seed, repeat).result()
+            except Exception as e:
+                result = {'error': str(e) or e.__class__.__name__}
+        result.update(id=case_id, bench=bench, cover=label, payload=size)
+        results.append(result)
+        if progress:
+            print(f"[{n}/{len(cases)}] {_describe(result)}", file=sys.stderr, flush=True)
+    import numpy
+    meta = {'profile': profile_name, 'seed': seed, 'repeat': repeat, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'numpy': numpy.__version__, 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'kdf_iterations': int(os.environ.get('HIDENSEEK_KDF_ITERATIONS', 200_000))}
+    return {'meta': meta, 'results': results}
+
+def _describe(r: dict) -> str:
+    if 'error' in r:
+        return f"{r['id']:<40} ERROR {r['error']}"
+    rate = f"{r['mb_s']:9.1f} MB/s" if r['mb_s'] is not None else ' ' * 14
+    return f"{r['id']:<40} {r['wall_s'] * 1000:10.1f} ms {rate} {r['peak_rss_mb']:8.1f} MB peak"
+
+#  Baseline comparison
+def compare(current: dict, baseline: dict, threshold: float, rss_threshold: float = None) -> list:
+    # ids whose median wall time (or peak RSS) grew by more than the threshold fraction
+    rss_threshold = threshold if rss_threshold is None else rss_threshold
+    base = {r['id']: r for r in baseline['results'] if 'error' not in r}
+    regressions = []
+    for r in current['results']:
+        b = base.get(r['id'])
+        if b is None:
+            continue
+        if 'error' in r:
+            regressions.append((r['id'], 'error', None, r['error']))
+            continue
+        ratio = r['wall_s'] / b['wall_s'] if b['wall_s'] else 1.0
+        r['vs_baseline'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append((r['id'], 'wall_s', b['wall_s'], r['wall_s']))
+        if b.get('peak_rss_mb') and r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + rss_threshold):
+            regressions.append((r['id'], 'peak_rss_mb', b['peak_rss_mb'], r['peak_rss_mb']))
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark HideNseek embed/extract paths.')
+    parser.add_argument('--profile', choices=PROFILES, default='quick')
+    parser.add_argument('--only', action='append', default=[], help='run case ids matching this glob (repeatable)')
+    parser.add_argument('--repeat', type=int, help='timed runs per case (default from the profile)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'hidenseek-bench'),
+                        help='where generated covers are cached')
+    parser.add_argument('-o', '--output', help='write results JSON here')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown fraction (default 0.10)')
+    parser.add_argument('--rss-threshold', type=float, help='allowed peak RSS growth (default: --threshold)')
+    parser.add_argument('--list', action='store_true', help='list case ids and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for case in build_cases(PROFILES[args.profile], args.workdir, args.seed):
+            print(case[0])
+        return 0
+
+    results = run(args.profile, args.workdir, args.seed, args.only, args.repeat)
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.rss_threshold)
+        for case_id, metric, before, after in regressions:
+            print(f"REGRESSION {case_id} {metric}: {before} -> {after}", file=sys.stderr)
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    if any('error' in r for r in results['results']):
+        status = 1
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# bitcodec.py
+# Payload <-> bit conversion shared by the image, audio and video carriers.
+# Payloads are UTF-8 bytes, and their bits are uint8 arrays of 0/1, MSB first,
+# that a carrier can write straight into its sample LSBs.
+import numpy as np
+
+def to_bytes(message) -> bytes:
+    return message.encode('utf-8') if isinstance(message, str) else bytes(message)
+
+def encode(message) -> np.ndarray:
+    # str (as UTF-8) or bytes -> one uint8 per bit
+    return np.unpackbits(np.frombuffer(to_bytes(message), dtype=np.uint8))
+
+def decode(bits: np.ndarray) -> bytes:
+    # bits -> bytes; a trailing partial byte is zero-padded
+    return np.packbits(bits).tobytes()
+
+def read_lsb(samples: np.ndarray) -> np.ndarray:
+    # LSB plane of any integer sample array, flattened to uint8 bits
+    return np.bitwise_and(samples, 1).astype(np.uint8, copy=False).reshape(-1)
+
+def write_lsb(samples: np.ndarray, bits: np.ndarray):
+    # overwrites the LSBs of `samples` (a flat view) in place with `bits`
+    samples[:] = (samples & np.invert(samples.dtype.type(1))) | bits
+
+#  Legacy framing
+# Carriers written before the header existed end the message with 16 zero bits.
+DELIM_LEN = 16
+
+def find_delim(bits: np.ndarray) -> int:
+    # index where the first run of DELIM_LEN zero bits starts, or -1
+    ones = np.flatnonzero(bits)
+    edges = np.concatenate(([-1], ones, [bits.size]))
+    hit = np.flatnonzero(np.diff(edges) - 1 >= DELIM_LEN)
+    return int(edges[hit[0]] + 1) if hit.size else -1
+
+def legacy_text(bits: np.ndarray) -> str:
+    # legacy payloads hold one character per 8 bits, so only code points below 256 survive
+    whole = bits.size - bits.size % 8
+    text = decode(bits[:whole]).decode('latin-1')
+    if whole < bits.size:  # trailing partial byte is read as a plain binary number
+        text += chr(int(''.join(map(str, bits[whole:])), 2))
+    return text
@@ -0,0 +1,65 @@
+# cache.py
+# Memoized extraction results. Keys carry the carrier's SHA-256, so repeated
+# extractions from the same file (e.g. retrying a password) skip the media
+# decode entirely and only redo decryption.
+import hashlib, threading
+from collections import OrderedDict
+
+_CHUNK = 1024 * 1024
+
+def content_digest(stream) -> str:
+    # SHA-256 of a seekable binary stream, leaving it rewound
+    h = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(_CHUNK), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+def _size(payload) -> int:
+    return len(payload) if isinstance(payload, (bytes, bytearray)) else len(payload.encode('utf-8'))
+
+class ExtractionCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        size = _size(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= _size(old)
+            self._entries[key] = payload
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _size(evicted)
+                self.evictions += 1
+
+    def get_or_extract(self, key, extract):
+        payload = self.get(key)
+        if payload is None:
+            payload = extract()
+            self.put(key, payload)
+        return payload
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
@@ -0,0 +1,195 @@
+# cli.py
+# Headless front end: embed into or extract from files and whole directory trees
+# without Flask. Each media backend is imported only when a file of that type is
+# processed, so short runs start quickly.
+#
+#   python cli.py embed photos/ -o stego/ -m "hello" --glob "*.png" --jobs 4
+#   python cli.py extract stego/ --encrypt > found.ndjson
+#   python cli.py scan incoming/ --jobs 4 > report.ndjson
+import argparse, fnmatch, getpass, json, multiprocessing, os, sys, time
+import backends
+from backends import kind_for as media_kind
+
+OUTPUT_EXTS = {'image': '.png', 'audio': '.wav', 'video': '.avi'}
+
+def find_carriers(paths, patterns=(), kinds=()):
+    # (path, path relative to the argument it was found under) for every supported file
+    for root in paths:
+        if os.path.isfile(root):
+            found = [(root, os.path.basename(root))]
+        else:
+            found = []
+            for dirpath, dirnames, names in os.walk(root):
+                dirnames.sort()
+                for name in sorted(names):
+                    path = os.path.join(dirpath, name)
+                    found.append((path, os.path.relpath(path, root)))
+        for path, rel in found:
+            kind = media_kind(path)
+            if kind is None or (kinds and kind not in kinds):
+                continue
+            if patterns and not any(fnmatch.fnmatch(rel, p) or fnmatch.fnmatch(os.path.basename(rel), p)
+                                    for p in patterns):
+                continue
+            yield path, rel
+
+#  Tasks (run in worker processes when --jobs > 1)
+def _embed_one(kind, src, dst, message, password, compression, lossless):
+    message, compression = backends.seal(message, password, compression)
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    opts = {'lossless': lossless} if kind == 'video' else {}
+    backends.get(kind).embed(src, dst, message, compression=compression, **opts)
+    return dst
+
+def _extract_one(kind, src, password):
+    return backends.reveal(kind, src, password)
+
+def _fail(kind, src, error):
+    raise ValueError(error)
+
+def _scan_one(kind, src):
+    from scanner import scan
+    return scan(kind, src)
+
+def _call(task):
+    fn, args = task
+    try:
+        return args[1], fn(*args), None
+    except Exception as e:
+        return args[1], None, str(e) or e.__class__.__name__
+
+def run_tasks(tasks, jobs: int = 1):
+    # yields (source path, result, error) as tasks finish
+    if jobs <= 1 or len(tasks) <= 1:
+        yield from map(_call, tasks)
+        return
+    with multiprocessing.Pool(min(jobs, len(tasks))) as pool:
+        yield from pool.imap_unordered(_call, tasks)
+
+#  Commands
+def _password(args):
+    if not args.encrypt:
+        return None
+    password = os.environ.get('HIDENSEEK_PASSWORD') or getpass.getpass('Password: ')
+    if not password:
+        raise SystemExit('error: a password is required with --encrypt')
+    return password
+
+def _message(args) -> str:
+    if args.message is not None:
+        return args.message
+    if args.message_file == '-':
+        return sys.stdin.read()
+    with open(args.message_file, encoding='utf-8') as f:
+        return f.read()
+
+def cmd_embed(args):
+    message = _message(args)
+    if not message:
+        raise SystemExit('error: the message is empty')
+    password = _password(args)
+    carriers = list(find_carriers(args.paths, args.glob, args.type))
+    tasks = []
+    for (src, _), dst in zip(carriers, output_paths(args.output, carriers)):
+        kind = media_kind(src)
+        if dst is None:
+            tasks.append((_fail, (kind, src, 'Both output names for this file are taken by other carriers')))
+        else:
+            tasks.append((_embed_one, (kind, src, dst, message, password, args.compression, args.lossless)))
+    return _report(tasks, args, lambda src, dst: {'path': src, 'ok': True, 'output': dst})
+
+def output_paths(out_dir, carriers) -> list:
+    # an output path per (path, rel) carrier, or None if none is free. The input
+    # tree is mirrored with each kind's output extension; carriers already in that
+    # format keep their names, and one that would land on a taken path (a.bmp next
+    # to a.png) keeps its source extension too (a.bmp.png).
+    def keeps_name(i):
+        src, rel = carriers[i]
+        return os.path.splitext(rel)[1].lower() == OUTPUT_EXTS[media_kind(src)]
+    taken, outputs = set(), [None] * len(carriers)
+    for i in sorted(range(len(carriers)), key=keeps_name, reverse=True):
+        src, rel = carriers[i]
+        for name in (os.path.splitext(rel)[0], rel):
+            dst = os.path.join(out_dir, name + OUTPUT_EXTS[media_kind(src)])
+            if os.path.normpath(dst) not in taken:
+                taken.add(os.path.normpath(dst))
+                outputs[i] = dst
+                break
+    return outputs
+
+def cmd_extract(args):
+    password = _password(args)
+    tasks = [(_extract_one, (media_kind(src), src, password))
+             for src, _ in find_carriers(args.paths, args.glob, args.type)]
+    return _report(tasks, args, lambda src, text: {'path': src, 'ok': True, 'extracted': text})
+
+def cmd_scan(args):
+    from scanner import SCANNERS
+    kinds = [k for k in args.type or SCANNERS if k in SCANNERS]
+    if not kinds:
+        raise SystemExit('error: scanning supports images and WAV files only')
+    tasks = [(_scan_one, (media_kind(src), src)) for src, _ in find_carriers(args.paths, args.glob, kinds)]
+    return _report(tasks, args, lambda src, result: {'path': src, 'ok': True, **result})
+
+def _report(tasks, args, record):
+    # results go to stdout as NDJSON, progress to stderr; exit status 1 if anything failed
+    if not tasks:
+        print('No matching carriers found.', file=sys.stderr)
+        return 1
+    failed, start = 0, time.perf_counter()
+    for done, (src, result, error) in enumerate(run_tasks(tasks, args.jobs), 1):
+        if error is None:
+            line = record(src, result)
+        else:
+            failed += 1
+            line = {'path': src, 'ok': False, 'error': error}
+        print(json.dumps(line, ensure_ascii=False), flush=True)
+        if not args.quiet:
+            status = 'ok' if error is None else f'FAILED: {error}'
+            print(f'[{done}/{len(tasks)}] {src} {status}', file=sys.stderr, flush=True)
+    if not args.quiet:
+        print(f'{len(tasks) - failed} ok, {failed} failed in {time.perf_counter() - start:.1f}s',
+              file=sys.stderr)
+    return 1 if failed else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='hidenseek', description='Hide or reveal messages in images, WAV audio and video.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p, encrypt=True):
+        p.add_argument('paths', nargs='+', help='carrier files or directories (searched recursively)')
+        p.add_argument('-g', '--glob', action='append', default=[], help='only files matching this pattern (repeatable)')
+        p.add_argument('-t', '--type', action='append', default=[], choices=backends.KINDS,
+                       help='only this media type (repeatable)')
+        p.add_argument('-j', '--jobs', type=int, default=1, help='worker processes (default 1)')
+        if encrypt:
+            p.add_argument('-e', '--encrypt', action='store_true',
+                           help='password-protect the message; read from $HIDENSEEK_PASSWORD or prompted')
+        p.add_argument('-q', '--quiet', action='store_true', help='no progress on stderr')
+
+    embed = sub.add_parser('embed', help='embed a message into every carrier')
+    common(embed)
+    msg = embed.add_mutually_exclusive_group(required=True)
+    msg.add_argument('-m', '--message', help='message text')
+    msg.add_argument('-f', '--message-file', help="read the message from a file ('-' for stdin)")
+    embed.add_argument('-o', '--output', required=True, help='output directory; the input tree is mirrored')
+    embed.add_argument('--compression', default='auto', choices=('auto', 'none', 'zlib', 'bz2', 'lzma'))
+    embed.add_argument('--lossy', dest='lossless', action='store_false',
+                       help='write video as lossy XVID instead of lossless FFV1 (XVID usually destroys the message)')
+    embed.set_defaults(func=cmd_embed)
+
+    extract = sub.add_parser('extract', help='extract hidden messages (NDJSON on stdout)')
+    common(extract)
+    extract.set_defaults(func=cmd_extract)
+
+    scan = sub.add_parser('scan', help='screen images and WAVs for hidden payloads without extracting them')
+    common(scan, encrypt=False)
+    scan.set_defaults(func=cmd_scan)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# compression.py
+# Payload compression applied before framing. The codec id is stored in the
+# frame header flags, so extractors decompress without being told which one.
+import bz2, lzma, zlib
+
+NONE, ZLIB, BZ2, LZMA = 0, 1, 2, 3
+CODECS = {'none': NONE, 'zlib': ZLIB, 'bz2': BZ2, 'lzma': LZMA}
+MIN_SIZE = 64  # payloads shorter than this never shrink enough to bother
+PROBE_SIZE = 64 * 1024  # bytes sampled by a fast deflate pass before 'auto' tries every codec
+PROBE_RATIO = 0.95  # a sample that doesn't shrink below this is treated as incompressible
+MAX_OUTPUT = 64 * 1024 * 1024  # refuse to inflate a payload beyond this
+
+# raw streams: no container headers eating into carrier capacity
+_LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 6}]
+
+def _deflate(data: bytes) -> bytes:
+    c = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush()
+
+_COMPRESS = {
+    ZLIB: _deflate,
+    BZ2: lambda data: bz2.compress(data, 9),
+    LZMA: lambda data: lzma.compress(data, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS),
+}
+
+def _decompressor(codec: int):
+    if codec == ZLIB:
+        return zlib.decompressobj(-15)
+    if codec == BZ2:
+        return bz2.BZ2Decompressor()
+    if codec == LZMA:
+        return lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+    raise ValueError(f"Unsupported payload compression {codec}")
+
+def compressible(data: bytes) -> bool:
+    # level-1 deflate over a few slices of the data; ciphertext and already
+    # compressed media (PNG/WebP secrets) come out no smaller
+    if len(data) < MIN_SIZE:
+        return False
+    if len(data) <= PROBE_SIZE:
+        sample = data
+    else:
+        step, part = len(data) // 4, PROBE_SIZE // 4
+        sample = b''.join(data[i * step:i * step + part] for i in range(4))
+    return len(zlib.compress(sample, 1)) < len(sample) * PROBE_RATIO
+
+def compress(data: bytes, codec: str = 'auto'):
+    # (codec id, stored bytes); 'auto' keeps the smallest result, and raw data
+    # whenever no codec actually makes it smaller
+    if codec == 'auto':
+        if not compressible(data):
+            return NONE, data
+        best = (NONE, data)
+        for cid, fn in _COMPRESS.items():
+            out = fn(data)
+            if len(out) < len(best[1]):
+                best = (cid, out)
+        return best
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec {codec!r}")
+    cid = CODECS[codec]
+    return (cid, _COMPRESS[cid](data)) if cid != NONE else (NONE, data)
+
+def decompress(codec: int, data: bytes, limit: int = MAX_OUTPUT) -> bytes:
+    if codec == NONE:
+        return data
+    d = _decompressor(codec)
+    try:
+        out = d.decompress(data, limit)
+    except (zlib.error, OSError, EOFError, lzma.LZMAError):
+        raise ValueError("Hidden message is corrupted (decompression failed)")
+    if not d.eof:
+        if len(out) >= limit:
+            raise ValueError("Hidden message expands beyond the size limit")
+        raise ValueError("Hidden message is corrupted (truncated compressed data)")
+    return out
@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+# Read by gunicorn from the working directory. Setting HIDENSEEK_PRELOAD (e.g.
+# "image,audio" or "all") loads the app and those stego backends once in the
+# master, so workers fork with them already imported and share the pages;
+# without it each worker imports a backend the first time it needs one.
+import os
+
+preload_app = bool(os.environ.get('HIDENSEEK_PRELOAD'))
+
+def on_starting(server):
+    if preload_app:
+        import security  # cryptography, used by every encrypted request
@@ -0,0 +1,291 @@
+# jobs.py
+# Background job queue for heavy media work. Every job runs in its own worker
+# process, so it can be timed out or cancelled, and a dispatcher thread starts
+# them as slots free up. Slots are lock files shared by every web worker on the
+# machine, so `max_workers` and `max_cost` hold machine-wide. Job state is
+# mirrored to small JSON files so any web worker can report status or request
+# cancellation; no external broker is involved.
+import collections, fcntl, json, multiprocessing, os, threading, time, uuid
+import backends, metrics
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = 'pending', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+TOUCH_INTERVAL = 60  # seconds between touches of a waiting or running job's input files
+
+#  Tasks (run inside the worker process)
+def embed_task(kind: str, in_path: str, store_root: str, filename: str, message: str,
+               password: str = None, **opts):
+    # the result goes into the blob store; the job result names it by digest
+    from store import BlobStore
+    message, opts['compression'] = backends.seal(message, password, opts.get('compression', 'auto'))
+    store = BlobStore(store_root, sweep_interval=0)
+    out_path = store.temp_path(os.path.splitext(filename)[1])
+    try:
+        backends.get(kind).embed(in_path, out_path, message, **opts)
+        digest = store.put_path(out_path)
+    finally:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+    return {'download': digest, 'filename': filename}
+
+def extract_task(kind: str, in_path: str, password: str = None, keep_payload: bool = False):
+    # keep_payload hands the undecrypted payload back too, even when decryption
+    # fails, so the caller can cache it; a result carrying 'error' marks the job failed
+    if not keep_payload:
+        return {'extracted': backends.reveal(kind, in_path, password)}
+    payload = backends.get(kind).extract(in_path, raw=bool(password))
+    result = {'payload': payload}
+    try:
+        result['extracted'] = backends.unseal(payload, password) if password else payload
+    except ValueError as e:
+        result['error'] = str(e)
+    return result
+
+def _run(conn, labels, fn, args, kwargs):
+    # stage timings recorded here go back with the result, under the submitting route's labels
+    metrics.bind(*labels)
+    try:
+        try:
+            reply = ('ok', fn(*args, **kwargs))
+        except Exception as e:
+            reply = ('error', str(e) or e.__class__.__name__)
+        conn.send(reply + (metrics.snapshot(),))
+    finally:
+        conn.close()
+
+#  Slots
+class Slots:
+    # machine-wide cap on running jobs: one lock file per slot, flocked by the
+    # process running a job in it and holding the job's cost. The OS drops the
+    # lock if that process dies, so a crashed web worker never leaks a slot.
+    def __init__(self, directory: str, count: int):
+        self._paths = [os.path.join(directory, f'slot{i}.lock') for i in range(count)]
+
+    def acquire(self, cost: float, max_cost: float = None):
+        # a held slot's file descriptor, or None if every slot is taken or the
+        # running cost leaves no room for `cost` (a lone job always runs)
+        free, running, busy = None, 0, 0.0
+        for path in self._paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                running += 1
+                try: busy += float(os.pread(fd, 32, 0) or 0)
+                except ValueError: pass
+                os.close(fd)
+                continue
+            if free is None:
+                free = fd
+            else:
+                os.close(fd)
+        if free is not None and max_cost is not None and running and busy + cost > max_cost:
+            os.close(free)
+            free = None
+        if free is not None:
+            os.ftruncate(free, 0)
+            os.pwrite(free, repr(float(cost)).encode(), 0)
+        return free
+
+    @staticmethod
+    def release(fd: int):
+        os.close(fd)  # drops the lock
+
+#  Queue
+class Job:
+    def __init__(self, fn, args, kwargs, timeout, on_done=None, cost=0.0, private=(), inputs=()):
+        self.id = uuid.uuid4().hex
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.timeout = timeout
+        self.cost = cost  # estimated seconds of work, see admission.py
+        self.private = tuple(private)  # result keys only stored sealed under `key`
+        self.key = None  # never written to disk; the submitter hands it to the requester
+        self.sealed = None
+        self.inputs = tuple(inputs)  # files the job reads, e.g. blob store paths
+        self.created = self._touched = time.time()
+        self.started = self.finished = None
+        self._call = (metrics.current(), fn, args, kwargs)
+        self._on_done = on_done
+        self._proc = self._conn = self._slot = None
+        if self.private:
+            from cryptography.fernet import Fernet
+            self.key = Fernet.generate_key().decode('ascii')  # URL-safe
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'status': self.status, 'result': self.result, 'error': self.error,
+                'private': list(self.private), 'sealed': self.sealed, 'cost': self.cost,
+                'created': self.created, 'started': self.started, 'finished': self.finished}
+
+class JobQueue:
+    def __init__(self, state_dir: str, max_workers: int = 2, timeout: float = 600,
+                 keep: float = 3600, start_method: str = 'spawn', max_cost: float = None):
+        self.state_dir = state_dir
+        self.max_workers = max_workers  # jobs running at once, machine-wide
+        self.max_cost = max_cost  # estimated seconds allowed to run at once; a lone job always runs
+        self.timeout = timeout
+        self.keep = keep  # seconds a finished job's record is kept around
+        self._ctx = multiprocessing.get_context(start_method)
+        self._jobs = {}
+        self._pending = collections.deque()
+        self._running = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        os.makedirs(state_dir, exist_ok=True)
+        self._slots = Slots(state_dir, max_workers)
+
+    def submit(self, fn, *args, timeout: float = None, on_done=None, cost: float = 0.0,
+               private=(), inputs=(), **kwargs) -> Job:
+        # on_done(result) runs on the dispatcher thread before the result is
+        # recorded, so it may pop values that should not be persisted. Result keys
+        # named in `private` (e.g. decrypted text) are stored encrypted under
+        # job.key, which only the caller gets; status(..., key=job.key) opens them.
+        # `inputs` are touched while the job waits and runs, so the blob store's
+        # sweeper (which evicts by mtime) leaves them alone however long the queue.
+        job = Job(fn, args, kwargs, timeout or self.timeout, on_done, cost, private, inputs)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._save(job)
+            # started lazily so a forking server never inherits a live dispatcher
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._dispatch, name='jobs', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return job
+
+    def backlog(self) -> float:
+        # estimated seconds of work queued or running in this web worker
+        with self._lock:
+            return sum(job.cost for job in self._pending) + sum(job.cost for job in self._running)
+
+    def status(self, job_id: str, key: str = None):
+        # job record as a dict, read from disk if another worker owns the job.
+        # With the job's key, the private result values are opened back into 'result'.
+        with self._lock:
+            job = self._jobs.get(job_id)
+            record = job.to_dict() if job is not None else None
+        if record is None:
+            try:
+                with open(self._path(job_id)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                return None
+        sealed = record.pop('sealed', None)
+        if sealed and key:
+            from cryptography.fernet import Fernet, InvalidToken
+            try: record['result'] = dict(record['result'] or {}, **json.loads(Fernet(key).decrypt(sealed)))
+            except (InvalidToken, ValueError): pass
+        return record
+
+    def cancel(self, job_id: str) -> bool:
+        record = self.status(job_id)
+        if record is None or record['status'] in FINISHED:
+            return False
+        open(self._path(job_id, '.cancel'), 'w').close()
+        self._wake.set()
+        return True
+
+    def _path(self, job_id: str, suffix: str = '.json') -> str:
+        return os.path.join(self.state_dir, os.path.basename(job_id) + suffix)
+
+    def _save(self, job: Job):
+        tmp = self._path(job.id, '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp, self._path(job.id))
+
+    def _finish(self, job: Job, status: str, result=None, error=None):
+        if isinstance(result, dict):
+            private = {k: result.pop(k) for k in job.private if k in result}
+            if private:
+                from cryptography.fernet import Fernet
+                job.sealed = Fernet(job.key).encrypt(json.dumps(private).encode()).decode('ascii')
+        job.status, job.result, job.error, job.finished = status, result, error, time.time()
+        if job._proc is not None:
+            if job._proc.is_alive():
+                job._proc.terminate()
+            job._proc.join(1)
+            job._conn.close()
+            job._proc = job._conn = None
+        if job._slot is not None:
+            Slots.release(job._slot)
+            job._slot = None
+        job._call = job._on_done = None
+        self._save(job)
+
+    def _dispatch(self):
+        while True:
+            self._wake.wait(0.2)
+            self._wake.clear()
+            with self._lock:
+                self._tick()
+
+    def _tick(self):
+        now = time.time()
+        for job in list(self._pending):
+            if os.path.exists(self._path(job.id, '.cancel')):
+                self._pending.remove(job)
+                self._finish(job, CANCELLED)
+        for job in list(self._pending) + self._running:
+            if now - job._touched > TOUCH_INTERVAL:
+                job._touched = now
+                for path in job.inputs:
+                    try: os.utime(path)
+                    except OSError: pass
+
+        for job in list(self._running):
+            if job._conn.poll():
+                try:
+                    kind, value, timings = job._conn.recv()
+                    metrics.merge(timings)
+                except EOFError:
+                    kind, value = 'error', 'Worker exited unexpectedly'
+                if kind == 'ok' and job._on_done is not None:
+                    try: job._on_done(value)
+                    except Exception: pass
+                if kind != 'ok':
+                    self._finish(job, FAILED, error=value)
+                elif isinstance(value, dict) and 'error' in value:
+                    self._finish(job, FAILED, error=value.pop('error'), result=value or None)
+                else:
+                    self._finish(job, DONE, result=value)
+            elif os.path.exists(self._path(job.id, '.cancel')):
+                self._finish(job, CANCELLED)
+            elif now - job.started > job.timeout:
+                self._finish(job, FAILED, error=f'Timed out after {job.timeout:.0f}s')
+            elif not job._proc.is_alive():
+                self._finish(job, FAILED, error='Worker exited unexpectedly')
+            else:
+                continue
+            self._running.remove(job)
+
+        while self._pending:
+            slot = self._slots.acquire(self._pending[0].cost, self.max_cost)
+            if slot is None:
+                break
+            job = self._pending.popleft()
+            job._slot = slot
+            parent, child = self._ctx.Pipe(duplex=False)
+            job._conn = parent
+            job._proc = self._ctx.Process(target=_run, args=(child,) + job._call, daemon=True)
+            try:
+                job._proc.start()
+            except Exception as e:
+                parent.close(); job._proc = job._conn = None
+                self._finish(job, FAILED, error=f'Could not start worker: {e}')
+                continue
+            finally:
+                child.close()
+            job.status, job.started = RUNNING, now
+            self._running.append(job)
+            self._save(job)
+
+        for job_id, job in list(self._jobs.items()):
+            if job.status in FINISHED and now - job.finished > self.keep:
+                del self._jobs[job_id]
+                for suffix in ('.json', '.cancel'):
+                    try: os.remove(self._path(job_id, suffix))
+                    except OSError: pass
@@ -0,0 +1,161 @@
+# metrics.py
+# Per-stage latency histograms served in Prometheus text format. Stage timers
+# label themselves with the route and media type bound for the current request
+# (or job), so one `with stage('kdf'):` in security.py shows up per route.
+# HIDENSEEK_METRICS=0 turns every hook into a no-op. Sampled cProfile dumps of
+# slow requests are opt-in, see start_profile().
+import contextlib, contextvars, cProfile, math, os, random, threading, time
+
+ENABLED = os.environ.get('HIDENSEEK_METRICS', '1') != '0'
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, math.inf)
+
+_labels = contextvars.ContextVar('hidenseek_metric_labels', default=('none', 'none'))
+_NULL = contextlib.nullcontext()
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+_HELP = {
+    'hidenseek_request_seconds': 'Request latency by route and media type.',
+    'hidenseek_stage_seconds': 'Time spent in each processing stage (upload, kdf, decode, frame, lsb, encode, scan, fit, store).',
+}
+_histograms = {}  # (metric, labels tuple) -> Histogram
+_lock = threading.Lock()
+_collectors = []
+
+def current() -> tuple:
+    return _labels.get()
+
+def bind(route: str, media: str = 'none'):
+    # labels for stages timed in this request/job; returns a token for unbind()
+    return _labels.set((route, media))
+
+def unbind(token):
+    _labels.reset(token)
+
+def observe(metric: str, seconds: float, **labels):
+    if not ENABLED:
+        return
+    route, media = _labels.get()
+    key = (metric, (('route', labels.pop('route', route)), ('media', labels.pop('media', media)))
+           + tuple(sorted(labels.items())))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(seconds)
+
+def observe_stage(name: str, seconds: float):
+    observe('hidenseek_stage_seconds', seconds, stage=name)
+
+@contextlib.contextmanager
+def _timed(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+def stage(name: str):
+    # `with stage('decode'):` times the block; a shared no-op when metrics are off
+    return _timed(name) if ENABLED else _NULL
+
+def snapshot() -> list:
+    # histogram state that another process can merge(), e.g. from a job worker
+    with _lock:
+        return [(metric, labels, list(h.counts), h.sum, h.count) for (metric, labels), h in _histograms.items()]
+
+def merge(state):
+    with _lock:
+        for metric, labels, counts, total, count in state or ():
+            key = (metric, tuple(tuple(pair) for pair in labels))
+            hist = _histograms.get(key)
+            if hist is None:
+                hist = _histograms[key] = Histogram()
+            hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+            hist.sum += total
+            hist.count += count
+
+def register_collector(fn):
+    # fn() -> iterable of (name, type, help, labels dict, value), rendered on every scrape
+    _collectors.append(fn)
+
+#  Prometheus text format
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+def _labelset(pairs) -> str:
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+def render() -> str:
+    lines, by_metric = [], {}
+    with _lock:
+        for (metric, labels), h in sorted(_histograms.items()):
+            by_metric.setdefault(metric, []).append((labels, list(h.counts), h.sum, h.count))
+    for metric, series in by_metric.items():
+        lines.append(f'# HELP {metric} {_HELP.get(metric, metric)}')
+        lines.append(f'# TYPE {metric} histogram')
+        for labels, counts, total, count in series:
+            base, cumulative = _labelset(labels), 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                le = '+Inf' if bound == math.inf else repr(float(bound))
+                lines.append(f'{metric}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{base}}} {total}')
+            lines.append(f'{metric}_count{{{base}}} {count}')
+    seen = set()
+    for collect in _collectors:
+        for name, kind, help_text, labels, value in collect():
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+            suffix = f'{{{_labelset(sorted(labels.items()))}}}' if labels else ''
+            lines.append(f'{name}{suffix} {value}')
+    return '\n'.join(lines) + '\n'
+
+#  Sampled profiling of slow requests
+_profile_lock = threading.Lock()
+
+def start_profile(sample_rate: float):
+    # a running cProfile.Profile for a sampled request, or None; one at a time,
+    # since newer Pythons allow only one active profiler per interpreter
+    if sample_rate <= 0 or random.random() >= sample_rate or not _profile_lock.acquire(blocking=False):
+        return None
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # another profiler is active
+        _profile_lock.release()
+        return None
+    return prof
+
+def finish_profile(prof, elapsed: float, slow: float, directory: str, name: str, keep: int = 50):
+    # stops the profiler and dumps it if the request was slow; returns the dump's path or None
+    try:
+        prof.disable()
+        if elapsed < slow:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{elapsed * 1000:.0f}ms.prof")
+        prof.dump_stats(path)
+        dumps = sorted(os.listdir(directory))
+        for old in dumps[:max(0, len(dumps) - keep)]:
+            try: os.remove(os.path.join(directory, old))
+            except OSError: pass
+        return path
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,135 @@
+# scanner.py
+# Quick screening of images and WAVs for hidden payloads, without extracting
+# them. The first LSBs are checked for a HideNseek frame header or a legacy
+# delimited message. Then the LSB-pair chi-square test (Westfeld & Pfitzmann)
+# runs on the head of the carrier, where payloads are written, and on regions
+# sampled across the rest of it. WAVs are read only at those regions.
+# Smooth histograms (16-bit audio, noise-like images) score high on their own,
+# so an unframed carrier is only flagged when its head scores high and its
+# body doesn't.
+import math, os, time
+import numpy as np
+from PIL import Image
+import bitcodec
+from audio_stego import _open_pcm16
+from compression import CODECS
+from utils import MAGIC, VERSION, HEADER, HEADER_BITS, CODEC_MASK
+
+HEAD_UNITS = 1 << 15    # channel values or samples tested at the start of a carrier
+SAMPLE_REGIONS = 16     # regions sampled across the rest of it
+REGION_UNITS = 1 << 12  # channel values or samples per region
+LEGACY_BITS = 8 * 1024  # LSBs searched for a legacy delimiter
+LEGACY_MIN_CHARS = 4    # shorter delimited text is too likely to be chance
+SUSPICIOUS_P = 0.95     # head embedding probability that flags an unframed carrier...
+CLEAN_P = 0.5           # ...as long as the sampled body stays below this
+
+_CODEC_NAMES = {v: k for k, v in CODECS.items()}
+
+#  Statistics
+def _chi2_sf(x: float, df: int) -> float:
+    # upper tail of the chi-square distribution (Wilson-Hilferty approximation)
+    z = ((x / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def chi_square(values: np.ndarray, levels: int):
+    # probability that the pairs of values (2k, 2k+1) were evened out by LSB
+    # embedding; near 1 for a fully embedded region, near 0 for a clean one.
+    # None if too few pairs are populated to tell.
+    counts = np.bincount(values.reshape(-1), minlength=levels).reshape(-1, 2)
+    expected = counts.sum(axis=1) / 2
+    used = expected > 4
+    df = int(used.sum()) - 1
+    if df < 1:
+        return None
+    stat = float((np.square(counts[used, 0] - expected[used]) / expected[used]).sum())
+    return _chi2_sf(stat, df)
+
+def _regions(total: int, start: int):
+    # offsets of SAMPLE_REGIONS evenly spaced regions in [start, total)
+    if total - start < REGION_UNITS:
+        return []
+    return np.linspace(start, total - REGION_UNITS, SAMPLE_REGIONS).astype(int).tolist()
+
+#  Payload checks
+def _framing(lsbs: np.ndarray, capacity_bits: int):
+    # what the first LSBs say about a payload, as a dict, or None
+    if lsbs.size >= HEADER_BITS:
+        magic, version, flags, length, _ = HEADER.unpack(bitcodec.decode(lsbs[:HEADER_BITS]))
+        if magic == MAGIC:
+            return {'framing': 'header', 'version': version, 'length': length,
+                    'codec': _CODEC_NAMES.get(flags & CODEC_MASK),
+                    'valid': version == VERSION and HEADER_BITS + length * 8 <= capacity_bits}
+    end = bitcodec.find_delim(lsbs[:LEGACY_BITS])
+    if end >= 0:
+        # a last character ending in zero bits loses them to the delimiter, so only whole ones count
+        text = bitcodec.legacy_text(lsbs[:end - end % 8])
+        # flat regions read as one repeated character ('ÿ' for white), which is no message
+        if len(text) >= LEGACY_MIN_CHARS and text.isascii() and text.isprintable() and len(set(text)) > 1:
+            return {'framing': 'legacy', 'length': len(text), 'valid': True}
+    return None
+
+def _report(framing, head: np.ndarray, body: np.ndarray, levels: int) -> dict:
+    p_head = chi_square(head, levels)
+    p_body = chi_square(body, levels) if body.size else None
+    head_clean = p_head is not None and p_head < CLEAN_P
+    if framing is not None and framing.pop('valid'):
+        # a legacy delimiter can turn up by chance, so it alone can't outweigh a clean head
+        verdict = 'suspicious' if framing['framing'] == 'legacy' and head_clean else 'payload'
+    elif p_head is not None and p_head >= SUSPICIOUS_P and p_body is not None and p_body < CLEAN_P:
+        verdict = 'suspicious'
+    else:
+        verdict = 'clean'
+    result = {'verdict': verdict}
+    result.update(framing or {'framing': None})
+    result['chi_square'] = {'head': None if p_head is None else round(p_head, 4),
+                            'body': None if p_body is None else round(p_body, 4)}
+    return result
+
+#  Carriers
+def scan_image(src) -> dict:
+    img = Image.open(src)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    flat = np.asarray(img).reshape(-1)
+    head = flat[:HEAD_UNITS]
+    starts = _regions(flat.size, head.size)
+    body = np.concatenate([flat[s:s + REGION_UNITS] for s in starts]) if starts else flat[:0]
+    framing = _framing(bitcodec.read_lsb(flat[:max(HEADER_BITS, LEGACY_BITS)]), flat.size)
+    return _report(framing, head, body, 256)
+
+def scan_wav(src) -> dict:
+    with _open_pcm16(src) as wf:
+        channels, nframes = wf.getnchannels(), wf.getnframes()
+        total = nframes * channels
+
+        def read(start: int, count: int) -> np.ndarray:
+            # `count` samples from sample `start`, widened so they index the histogram
+            wf.setpos(start // channels)
+            data = np.frombuffer(wf.readframes(-(-count // channels)), dtype=np.int16)[:count]
+            return data.astype(np.int32) + 32768
+
+        head = read(0, min(total, HEAD_UNITS))
+        body = [read(s, REGION_UNITS) for s in _regions(total, head.size)]
+    body = np.concatenate(body) if body else head[:0]
+    framing = _framing(bitcodec.read_lsb(head[:max(HEADER_BITS, LEGACY_BITS)]), total)
+    return _report(framing, head, body, 1 << 16)
+
+SCANNERS = {'image': scan_image, 'audio': scan_wav}
+
+def _size(src) -> int:
+    if hasattr(src, 'seek'):
+        size = src.seek(0, os.SEEK_END)
+        src.seek(0)
+        return size
+    return os.path.getsize(src)
+
+def scan(kind: str, src) -> dict:
+    # src is a path or a seekable binary file object; adds the throughput achieved
+    if kind not in SCANNERS:
+        raise ValueError(f"Scanning supports images and WAV files, not {kind}")
+    size, t0 = _size(src), time.perf_counter()
+    result = SCANNERS[kind](src)
+    seconds = time.perf_counter() - t0
+    result.update(kind=kind, bytes=size, seconds=round(seconds, 6),
+                  mb_s=round(size / seconds / 1e6, 2) if seconds else None)
+    return result
@@ -1,28 +1,120 @@
 # security.py
-import base64, os
+import base64, os, struct, time
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.fernet import Fernet
+from metrics import stage
 
-def password_to_key(password: str, salt: bytes):
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=200_000,
-    )
-    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+# Every payload records the KDF algorithm and iteration count it was written
+# with, so the defaults below can change without breaking older carriers.
+KDF_ALGORITHMS = {'pbkdf2-sha256': hashes.SHA256, 'pbkdf2-sha512': hashes.SHA512}
+KDF_ALGORITHM = os.environ.get('HIDENSEEK_KDF_ALGORITHM', 'pbkdf2-sha256')
+KDF_ITERATIONS = int(os.environ.get('HIDENSEEK_KDF_ITERATIONS', 200_000))
+# iteration counts read from a payload are untrusted; anything outside this is refused
+KDF_MAX_ITERATIONS = max(2_000_000, KDF_ITERATIONS)
 
-def encrypt_message(message: str, password: str) -> str:
+# payloads written before the KDF parameters were stored used these
+LEGACY_ALGORITHM, LEGACY_ITERATIONS = 'pbkdf2-sha256', 200_000
+
+_PREFIX = 'hns2'  # hns2$<algorithm>$<iterations>$<base64(salt + token)>
+
+# Binary payloads skip both base64 layers: version, algorithm id, iterations,
+# salt, then the raw Fernet token. The version byte has its high bit set, which
+# no base64 text payload can start with.
+BINARY_VERSION = 0x81
+_BINARY_HEAD = struct.Struct('>BBI16s')
+_ALGORITHM_IDS = {'pbkdf2-sha256': 1, 'pbkdf2-sha512': 2}
+_ALGORITHM_NAMES = {v: k for k, v in _ALGORITHM_IDS.items()}
+
+def password_to_key(password: str, salt: bytes, algorithm: str = KDF_ALGORITHM,
+                    iterations: int = KDF_ITERATIONS):
+    if algorithm not in KDF_ALGORITHMS:
+        raise ValueError(f"Unsupported key derivation algorithm {algorithm!r}")
+    with stage('kdf'):
+        kdf = PBKDF2HMAC(
+            algorithm=KDF_ALGORITHMS[algorithm](),
+            length=32,
+            salt=salt,
+            iterations=iterations,
+        )
+        return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+
+def encrypt_message(message: str, password: str, algorithm: str = KDF_ALGORITHM,
+                    iterations: int = KDF_ITERATIONS) -> str:
     salt = os.urandom(16)
-    key = password_to_key(password, salt)
+    key = password_to_key(password, salt, algorithm, iterations)
     f = Fernet(key)
     token = f.encrypt(message.encode())
-    return base64.b64encode(salt + token).decode()
+    return f"{_PREFIX}${algorithm}${iterations}${base64.b64encode(salt + token).decode()}"
+
+def encrypt_bytes(message, password: str, algorithm: str = KDF_ALGORITHM,
+                  iterations: int = KDF_ITERATIONS) -> bytes:
+    data = message.encode() if isinstance(message, str) else message
+    salt = os.urandom(16)
+    key = password_to_key(password, salt, algorithm, iterations)
+    token = base64.urlsafe_b64decode(Fernet(key).encrypt(data))
+    return _BINARY_HEAD.pack(BINARY_VERSION, _ALGORITHM_IDS[algorithm], iterations, salt) + token
+
+def encrypted_size(length: int) -> int:
+    # size of encrypt_bytes() output for `length` plaintext bytes, without running the KDF:
+    # Fernet adds version, timestamp, IV and HMAC around AES-CBC (PKCS7-padded) ciphertext
+    return _BINARY_HEAD.size + 1 + 8 + 16 + (length // 16 + 1) * 16 + 32
+
+def decrypt_bytes(payload: bytes, password: str) -> bytes:
+    if not payload or payload[0] != BINARY_VERSION:
+        return decrypt_message(payload, password).encode()
+    try:
+        _, algorithm_id, iterations, salt = _BINARY_HEAD.unpack_from(payload)
+        algorithm = _ALGORITHM_NAMES[algorithm_id]
+    except (struct.error, KeyError):
+        raise ValueError("Malformed encrypted payload")
+    if not 1 <= iterations <= KDF_MAX_ITERATIONS:
+        raise ValueError("Malformed encrypted payload")
+    key = password_to_key(password, salt, algorithm, iterations)
+    token = base64.urlsafe_b64encode(payload[_BINARY_HEAD.size:])
+    return Fernet(key).decrypt(token)
 
-def decrypt_message(token_b64: str, password: str) -> str:
+def decrypt_message(token_b64, password: str) -> str:
+    # accepts binary payloads as well as both base64 text formats
+    if isinstance(token_b64, (bytes, bytearray)):
+        if token_b64[:1] == bytes([BINARY_VERSION]):
+            return decrypt_bytes(token_b64, password).decode()
+        token_b64 = token_b64.decode('ascii')
+    algorithm, iterations = LEGACY_ALGORITHM, LEGACY_ITERATIONS
+    if token_b64.startswith(_PREFIX + '$'):
+        try:
+            _, algorithm, iterations, token_b64 = token_b64.split('$')
+            iterations = int(iterations)
+        except ValueError:
+            raise ValueError("Malformed encrypted payload")
+        if not 1 <= iterations <= KDF_MAX_ITERATIONS:
+            raise ValueError("Malformed encrypted payload")
     raw = base64.b64decode(token_b64)
     salt, token = raw[:16], raw[16:]
-    key = password_to_key(password, salt)
+    key = password_to_key(password, salt, algorithm, iterations)
     f = Fernet(key)
     return f.decrypt(token).decode()
+
+def benchmark_kdf(seconds: float = 3.0, algorithm: str = KDF_ALGORITHM,
+                  iterations: int = KDF_ITERATIONS, workers: int = None) -> dict:
+    # derives keys on `workers` threads for `seconds` and reports the derivation rate
+    workers = workers or os.cpu_count() or 1
+    salt, done = os.urandom(16), 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        while time.perf_counter() < deadline:
+            futures = [pool.submit(password_to_key, 'benchmark', salt, algorithm, iterations) for _ in range(workers)]
+            for fut in futures:
+                fut.result()
+            done += len(futures)
+    elapsed = time.perf_counter() - started
+    cores = min(workers, os.cpu_count() or 1)
+    return {'algorithm': algorithm, 'iterations': iterations, 'workers': workers,
+            'cores': cores, 'derivations_per_sec': done / elapsed,
+            'derivations_per_sec_per_core': done / elapsed / cores}
+
+if __name__ == "__main__":
+    for k, v in benchmark_kdf().items():
+        print(f"{k:30} {v:.2f}" if isinstance(v, float) else f"{k:30} {v}")
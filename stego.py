@@ -1,49 +1,130 @@
 # stego.py
+# LSB steganography for images, working directly on the RGB buffer with NumPy.
+import io, math
+import numpy as np
 from PIL import Image
-from utils import _str_to_bits, _bits_to_str
+from metrics import stage
+import bitcodec
+from utils import frame_payload, parse_header, unpack_payload, HEADER, HEADER_BITS
+
+SCAN_CHUNK = 1 << 15  # LSBs read per legacy extraction pass, doubled until the delimiter shows up
+SECRET_FORMATS = ('png', 'webp-lossless', 'webp')
+FIT_STEPS = 8  # most encodes fit_secret will try
+FIT_TOLERANCE = 0.03  # stop once the fitted scale is within 3% of the largest possible
 
 def _ensure_capacity(img, message_bits_len):
     w, h = img.size
     capacity = w * h * 3
     return message_bits_len <= capacity
 
-def embed_message(in_path: str, out_path: str, message: str):
-    img = Image.open(in_path).convert('RGB')
-    bits = _str_to_bits(message)
-    bits += '0' * 16  # delimiter
-    if not _ensure_capacity(img, len(bits)):
+# Image functions take paths or binary file objects for every input and output.
+
+def probe(src) -> dict:
+    # header-only read: PIL decodes pixel data lazily
+    with Image.open(src) as img:
+        w, h = img.size
+        fmt = img.format
+    return {'width': w, 'height': h, 'format': fmt, 'units': w * h, 'capacity_bits': w * h * 3}
+
+def capacity_bits(path) -> int:
+    return probe(path)['capacity_bits']
+
+def payload_capacity(path) -> int:
+    # bytes of payload the image can carry after the frame header
+    return max(0, capacity_bits(path) // 8 - HEADER.size)
+
+def encode_secret(img, fmt: str = 'png', quality: int = 85) -> bytes:
+    buf = io.BytesIO()
+    if fmt == 'png':
+        img.save(buf, format='PNG')
+    elif fmt == 'webp-lossless':
+        img.save(buf, format='WEBP', lossless=True)
+    elif fmt == 'webp':
+        img.save(buf, format='WEBP', quality=quality)
+    else:
+        raise ValueError(f"Unsupported secret image format {fmt!r}")
+    return buf.getvalue()
+
+def fit_secret(img, capacity: int, fmt: str = 'png', quality: int = 85) -> bytes:
+    # Encoded size grows roughly with pixel count, so the first guess scales both
+    # sides by sqrt(capacity / size); later steps bisect between the largest scale
+    # known to fit and the smallest known not to.
+    with stage('fit'):
+        return _fit_secret(img, capacity, fmt, quality)
+
+def _fit_secret(img, capacity: int, fmt: str, quality: int) -> bytes:
+    data = encode_secret(img, fmt, quality)
+    if len(data) <= capacity:
+        return data
+    best, lo, hi = None, 0.0, 1.0
+    scale = math.sqrt(capacity / len(data)) * 0.95
+    for _ in range(FIT_STEPS):
+        size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        data = encode_secret(img.resize(size, Image.LANCZOS), fmt, quality)
+        if len(data) <= capacity:
+            best, lo = data, scale
+        else:
+            hi = scale
+            if size == (1, 1):
+                break
+        if best is not None and hi - lo <= hi * FIT_TOLERANCE:
+            break
+        scale = (lo + hi) / 2 if best is not None else scale * math.sqrt(capacity / len(data)) * 0.95
+    if best is None:
+        raise ValueError("Secret image can't be shrunk enough to fit the cover")
+    return best
+
+def embed_message(in_path: str, out_path: str, message, compression: str = 'auto'):
+    img = Image.open(in_path)
+    with stage('frame'):
+        bits = bitcodec.encode(frame_payload(message, compression))
+    # checked on the lazily opened image, before any pixel data is decoded
+    if not _ensure_capacity(img, bits.size):
         raise ValueError("Image doesn't have enough capacity for message")
+    with stage('decode'):
+        img = img.convert('RGB')
+
+    # channels are interleaved R,G,B per pixel, which is exactly the embedding order;
+    # only the prefix holding the framed payload is touched
+    with stage('lsb'):
+        arr = np.array(img)
+        flat = arr.reshape(-1)
+        bitcodec.write_lsb(flat[:bits.size], bits)
 
-    pixels = list(img.getdata())
-    new_pixels = []
-    bit_idx = 0
-    for px in pixels:
-        r, g, b = px
-        r = (r & ~1) | (int(bits[bit_idx]) if bit_idx < len(bits) else 0); bit_idx += 1 if bit_idx < len(bits) else 0
-        g = (g & ~1) | (int(bits[bit_idx]) if bit_idx < len(bits) else 0); bit_idx += 1 if bit_idx < len(bits) else 0
-        b = (b & ~1) | (int(bits[bit_idx]) if bit_idx < len(bits) else 0); bit_idx += 1 if bit_idx < len(bits) else 0
-        new_pixels.append((r, g, b))
-
-    # if there are leftover pixels (shouldn't be), append them
-    if len(new_pixels) < len(pixels):
-        new_pixels.extend(pixels[len(new_pixels):])
-
-    stego = Image.new(img.mode, img.size)
-    stego.putdata(new_pixels)
-    stego.save(out_path, format='PNG')
+    with stage('encode'):
+        Image.fromarray(arr).save(out_path, format='PNG')
     return out_path
 
-def extract_message(stego_path: str):
-    img = Image.open(stego_path).convert('RGB')
-    pixels = list(img.getdata())
-    bits = ''
-    for r, g, b in pixels:
-        bits += str(r & 1)
-        bits += str(g & 1)
-        bits += str(b & 1)
-    delim = '0' * 16
-    if delim in bits:
-        bits = bits.split(delim)[0]
-    else:
-        raise ValueError("No hidden message found (delimiter missing)")
-    return _bits_to_str(bits)
+def _read_payload(flat):
+    head = parse_header(bitcodec.decode(bitcodec.read_lsb(flat[:HEADER_BITS])))
+    if head is None:
+        return None
+    length, crc, flags = head
+    end = HEADER_BITS + length * 8
+    if end > flat.size:
+        raise ValueError("Hidden message is corrupted (length exceeds image capacity)")
+    return unpack_payload(bitcodec.decode(bitcodec.read_lsb(flat[HEADER_BITS:end])), crc, flags)
+
+def _read_legacy(flat):
+    n = SCAN_CHUNK
+    while True:
+        bits = bitcodec.read_lsb(flat[:n])
+        end = bitcodec.find_delim(bits)
+        if end >= 0:
+            return bitcodec.legacy_text(bits[:end])
+        if n >= flat.size:
+            raise ValueError("No hidden message found (delimiter missing)")
+        n *= 2
+
+def extract_message(stego_path: str, raw: bool = False):
+    # raw=True returns the payload bytes instead of decoding them as text
+    with stage('decode'):
+        img = Image.open(stego_path).convert('RGB')
+        flat = np.asarray(img).reshape(-1)
+    with stage('scan'):
+        data = _read_payload(flat)
+        if data is None:
+            text = _read_legacy(flat)
+    if data is None:
+        return text.encode('latin-1') if raw else text
+    return data if raw else data.decode('utf-8')
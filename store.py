@@ -0,0 +1,128 @@
+# store.py
+# Content-addressed blob store for uploads and results. Blobs are keyed by their
+# SHA-256, so identical uploads are kept once. A blob's mtime doubles as its
+# last-access time: reads touch it, and the sweeper evicts by age first and then
+# least-recently-used until the store is back under its size cap.
+import hashlib, os, re, tempfile, threading, time, uuid
+from metrics import stage
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+_CHUNK = 1024 * 1024
+
+class BlobStore:
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3, max_age: float = 24 * 3600,
+                 grace: float = 15 * 60, sweep_interval: float = 300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace = grace  # recently used blobs are never evicted for size, e.g. queued job inputs
+        self.sweep_interval = sweep_interval  # 0 disables the background sweeper
+        self._blobs = os.path.join(root, 'blobs')
+        self._tmp = os.path.join(root, 'tmp')
+        self._sweeper = None
+        self._lock = threading.Lock()
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs, digest[:2], digest)
+
+    def temp_path(self, suffix: str = '') -> str:
+        # scratch path on the store's filesystem, for outputs that put_path will adopt
+        return os.path.join(self._tmp, uuid.uuid4().hex + suffix)
+
+    def put(self, stream) -> str:
+        self._start_sweeper()
+        h = hashlib.sha256()
+        with stage('store'):
+            with tempfile.NamedTemporaryFile(dir=self._tmp, delete=False) as tmp:
+                for chunk in iter(lambda: stream.read(_CHUNK), b''):
+                    h.update(chunk)
+                    tmp.write(chunk)
+            return self._adopt(tmp.name, h.hexdigest())
+
+    def put_path(self, path: str) -> str:
+        # moves a finished file into the store; the file must live under temp_path()
+        self._start_sweeper()
+        h = hashlib.sha256()
+        with stage('store'):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(_CHUNK), b''):
+                    h.update(chunk)
+            return self._adopt(path, h.hexdigest())
+
+    def _adopt(self, tmp_path: str, digest: str) -> str:
+        dest = self._blob_path(digest)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest):
+            try:
+                os.utime(dest)
+                os.remove(tmp_path)
+                return digest
+            except FileNotFoundError:  # swept since the exists() check; store this copy instead
+                pass
+        os.replace(tmp_path, dest)
+        return digest
+
+    def path(self, digest: str):
+        # filesystem path of a blob (marking it used), or None if unknown or evicted
+        if not _DIGEST.match(digest):
+            return None
+        path = self._blob_path(digest)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def sweep(self) -> int:
+        # evicts expired blobs, then LRU blobs over the size cap; returns bytes freed
+        now, freed, entries = time.time(), 0, []
+        for dirpath, _, names in os.walk(self._blobs):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        for name in os.listdir(self._tmp):  # scratch files left behind by dead jobs
+            path = os.path.join(self._tmp, name)
+            try:
+                if now - os.stat(path).st_mtime > self.max_age:
+                    os.remove(path)
+            except OSError:
+                pass
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            expired = now - mtime > self.max_age
+            if not expired and (total <= self.max_bytes or now - mtime < self.grace):
+                continue
+            try:
+                if os.stat(path).st_mtime != mtime:  # used since the walk
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            freed += size
+        return freed
+
+    def _start_sweeper(self):
+        # started lazily so a forking server never inherits a live sweeper thread
+        if not self.sweep_interval:
+            return
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep_forever, name='store-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            try:
+                self.sweep()
+            except OSError:
+                pass
+            time.sleep(self.sweep_interval)
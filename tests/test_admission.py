@@ -0,0 +1,50 @@
+# test_admission.py
+# Payload sizing and capacity checks made before any carrier is decoded.
+import io, random
+import pytest
+import admission
+from security import encrypt_bytes
+from utils import HEADER, frame_payload
+
+TEXT = 'the quick brown fox jumps over the lazy dog ' * 50
+
+def _info(capacity_bits):
+    return {'kind': 'image', 'capacity_bits': capacity_bits,
+            'capacity_bytes': None if capacity_bits is None else capacity_bits // 8 - HEADER.size}
+
+@pytest.mark.parametrize('message', ['', 'hi', 'héllo ✓', TEXT])
+def test_raw_message_that_fits_is_sized_without_compressing(message):
+    assert admission.payload_bits(message, capacity_bits=10 ** 9) == (HEADER.size + len(message.encode())) * 8
+    assert admission.payload_bits(message, compression='none') == (HEADER.size + len(message.encode())) * 8
+
+def test_message_too_big_raw_is_sized_compressed():
+    raw_bits = (HEADER.size + len(TEXT)) * 8
+    bits = admission.payload_bits(TEXT, capacity_bits=raw_bits - 8)
+    assert bits == len(frame_payload(TEXT)) * 8 < raw_bits
+
+@pytest.mark.parametrize('codec', ['zlib', 'bz2', 'lzma'])
+def test_explicit_codec_is_sized_exactly(codec):
+    assert admission.payload_bits(TEXT, compression=codec) == len(frame_payload(TEXT, codec)) * 8
+
+@pytest.mark.parametrize('length', [0, 1, 15, 16, 17, 1000])
+def test_encrypted_size_matches_the_real_payload(length):
+    message = 'x' * length
+    expected = len(frame_payload(encrypt_bytes(message, 'pw', iterations=1000), 'none')) * 8
+    assert admission.payload_bits(message, password='pw') == expected
+
+def test_check_fits():
+    needed = admission.payload_bits('hello')
+    admission.check_fits(_info(needed), 'hello')
+    admission.check_fits(_info(None), 'hello')  # unknown capacity is checked while embedding
+    with pytest.raises(admission.Rejected, match='needs 5 bytes'):
+        admission.check_fits(_info(needed - 1), 'hello')
+
+def test_incompressible_message_too_big_is_rejected():
+    data = random.Random(0).randbytes(2000)
+    with pytest.raises(admission.Rejected):
+        admission.check_fits(_info(8000), data)
+
+def test_unreadable_carrier_message_is_fixed():
+    with pytest.raises(admission.Rejected) as e:
+        admission.probe('image', io.BytesIO(b'not an image'))
+    assert str(e.value) == 'Unreadable image file'
@@ -0,0 +1,42 @@
+# test_cache.py
+# ExtractionCache byte accounting, LRU eviction and hit/miss counters.
+from cache import ExtractionCache
+
+def test_bytes_are_counted_as_encoded():
+    cache = ExtractionCache(max_bytes=1000)
+    cache.put('a', 'héllo')  # 6 bytes as UTF-8
+    cache.put('b', b'\x00' * 10)
+    assert cache.stats()['bytes'] == 16 and cache.stats()['entries'] == 2
+
+def test_replacing_a_key_replaces_its_bytes():
+    cache = ExtractionCache(max_bytes=1000)
+    cache.put('a', b'x' * 100)
+    cache.put('a', b'y' * 30)
+    assert cache.stats()['bytes'] == 30
+    assert cache.get('a') == b'y' * 30
+
+def test_least_recently_used_is_evicted():
+    cache = ExtractionCache(max_bytes=100)
+    for key in 'abc':
+        cache.put(key, b'.' * 40)  # 'a' goes once 'c' passes the cap
+    assert cache.get('a') is None
+    cache.get('b')  # 'b' is now more recent than 'c'
+    cache.put('d', b'.' * 40)
+    assert cache.get('c') is None and cache.get('b') is not None and cache.get('d') is not None
+    stats = cache.stats()
+    assert stats['evictions'] == 2 and stats['bytes'] == 80 and stats['bytes'] <= stats['max_bytes']
+
+def test_oversized_payload_is_not_cached():
+    cache = ExtractionCache(max_bytes=10)
+    cache.put('small', b'12345')
+    cache.put('big', b'x' * 11)
+    assert cache.get('big') is None and cache.get('small') == b'12345'
+    assert cache.stats()['bytes'] == 5
+
+def test_get_or_extract_counts_hits_and_misses():
+    cache, calls = ExtractionCache(), []
+    extract = lambda: calls.append(1) or 'payload'
+    assert cache.get_or_extract('k', extract) == 'payload'
+    assert cache.get_or_extract('k', extract) == 'payload'
+    assert len(calls) == 1
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
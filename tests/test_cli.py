@@ -0,0 +1,16 @@
+# test_cli.py
+# Output naming for `cli.py embed`.
+import os
+from cli import output_paths
+
+def test_output_paths_never_collide():
+    carriers = [('in/a.bmp', 'a.bmp'), ('in/a.png', 'a.png'), ('in/a.bmp.png', 'a.bmp.png'),
+                ('in/clip.mp4', 'clip.mp4'), ('in/clip.avi', 'clip.avi'), ('in/s/b.jpg', os.path.join('s', 'b.jpg'))]
+    outputs = output_paths('out', carriers)
+    assert outputs == [None, os.path.join('out', 'a.png'), os.path.join('out', 'a.bmp.png'),
+                       os.path.join('out', 'clip.mp4.avi'), os.path.join('out', 'clip.avi'),
+                       os.path.join('out', 's', 'b.png')]
+
+def test_same_file_listed_twice():
+    assert output_paths('out', [('a.wav', 'a.wav')] * 2) == [os.path.join('out', 'a.wav'),
+                                                              os.path.join('out', 'a.wav.wav')]
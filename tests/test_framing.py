@@ -0,0 +1,194 @@
+# test_framing.py
+# Payload framing (header, CRC, codec flags), the legacy delimiter fallback and
+# StreamDecoder's chunk carry-over.
+import io, random, struct, wave, zlib
+import numpy as np
+import pytest
+from PIL import Image
+import audio_stego, bitcodec, stego
+from utils import (HEADER, HEADER_BITS, MAGIC, VERSION, StreamDecoder, frame_payload, parse_header,
+                   unpack_payload)
+
+MESSAGES = ['', 'hi', 'héllo ✓ 日本語 🙂', 'lorem ipsum dolor sit amet ' * 200, bytes(range(256)) * 4]
+
+def _unframe(framed: bytes) -> bytes:
+    length, crc, flags = parse_header(framed)
+    return unpack_payload(framed[HEADER.size:HEADER.size + length], crc, flags)
+
+def _feed(bits: np.ndarray, sizes, capacity_bits=None) -> StreamDecoder:
+    # feeds bits in chunks of the given sizes (cycled), stopping once the decoder is done
+    decoder, pos, sizes = StreamDecoder(capacity_bits), 0, list(sizes)
+    for i in range(bits.size):
+        if pos >= bits.size or decoder.feed(bits[pos:pos + sizes[i % len(sizes)]]):
+            break
+        pos += sizes[i % len(sizes)]
+    return decoder
+
+def _as_bytes(message) -> bytes:
+    return message.encode('utf-8') if isinstance(message, str) else message
+
+#  Header round-trips
+@pytest.mark.parametrize('compression', ['auto', 'none', 'zlib', 'bz2', 'lzma'])
+@pytest.mark.parametrize('message', MESSAGES)
+def test_frame_round_trip(message, compression):
+    framed = frame_payload(message, compression)
+    magic, version, _, length, _ = HEADER.unpack(framed[:HEADER.size])
+    assert (magic, version) == (MAGIC, VERSION)
+    assert len(framed) == HEADER.size + length
+    assert _unframe(framed) == _as_bytes(message)
+
+def test_auto_keeps_incompressible_data_raw():
+    data = random.Random(1).randbytes(4096)
+    framed = frame_payload(data)
+    assert len(framed) == HEADER.size + len(data)
+    assert _unframe(framed) == data
+
+@pytest.mark.parametrize('sizes', [[1], [7], [8], [HEADER_BITS], [3, 500, 1], [1 << 16]])
+@pytest.mark.parametrize('message', MESSAGES)
+def test_stream_decoder_framed_any_chunking(message, sizes):
+    bits = np.concatenate((bitcodec.encode(frame_payload(message)), np.ones(100, np.uint8)))
+    decoder = _feed(bits, sizes)
+    assert decoder.done and not decoder.legacy
+    assert decoder.finish(raw=True) == _as_bytes(message)
+
+#  CRC and version errors
+def test_crc_mismatch():
+    framed = bytearray(frame_payload('some message', 'none'))
+    framed[-1] ^= 0x01
+    with pytest.raises(ValueError, match='checksum'):
+        _unframe(bytes(framed))
+
+def test_crc_mismatch_while_streaming():
+    framed = bytearray(frame_payload('some message', 'none'))
+    framed[HEADER.size] ^= 0x80
+    with pytest.raises(ValueError, match='checksum'):
+        _feed(bitcodec.encode(bytes(framed)), [5])
+
+def test_unsupported_version():
+    data = b'payload'
+    raw = HEADER.pack(MAGIC, VERSION + 1, 0, len(data), zlib.crc32(data)) + data
+    with pytest.raises(ValueError, match='version'):
+        parse_header(raw)
+    with pytest.raises(ValueError, match='version'):
+        _feed(bitcodec.encode(raw), [8])
+
+def test_no_magic_is_not_a_header():
+    assert parse_header(b'XYZ' + bytes(HEADER.size)) is None
+    assert parse_header(MAGIC) is None  # too short
+
+def test_unknown_codec_flag():
+    data = b'payload'
+    raw = HEADER.pack(MAGIC, VERSION, 0x0F, len(data), zlib.crc32(data)) + data
+    with pytest.raises(ValueError, match='compression'):
+        _unframe(raw)
+
+#  Legacy decoding
+MAGIC_BITS = ''.join(f'{b:08b}' for b in MAGIC)
+
+def _baseline_decode(bits: str) -> str:
+    # the original string-based extractor, kept here as the reference
+    delim = '0' * 16
+    if delim not in bits:
+        raise ValueError("No hidden message found (delimiter missing)")
+    bits = bits.split(delim)[0]
+    return ''.join(chr(int(bits[i:i + 8], 2)) for i in range(0, len(bits), 8))
+
+def _legacy_bits(rng: random.Random) -> str:
+    # baseline framing: 8 bits per character, 16 zero bits, then whatever the carrier held
+    text = ''.join(chr(rng.choice([rng.randrange(32, 127), rng.randrange(1, 256)]))
+                   for _ in range(rng.randrange(0, 40)))
+    tail = ''.join(rng.choice('01') for _ in range(rng.randrange(0, 300)))
+    return ''.join(f'{ord(c):08b}' for c in text) + '0' * 16 + tail
+
+@pytest.mark.parametrize('seed', range(200))
+def test_legacy_matches_baseline_across_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    bits_str = _legacy_bits(rng)
+    if bits_str.startswith(MAGIC_BITS):  # would be read as a frame header
+        return
+    bits = np.frombuffer(bits_str.encode(), np.uint8) - ord('0')
+    expected = _baseline_decode(bits_str)
+    for sizes in ([1], [rng.randrange(1, 40)], [rng.randrange(1, 17), rng.randrange(1, 200)], [bits.size]):
+        decoder = _feed(bits, sizes)
+        assert decoder.finish() == expected
+
+def test_legacy_zero_run_split_over_many_chunks():
+    # '@' ends in six zero bits, so the run starts inside it, as it did for the baseline
+    bits_str = ''.join(f'{ord(c):08b}' for c in 'legacy@') + '0' * 16 + '1' * 9
+    bits = np.frombuffer(bits_str.encode(), np.uint8) - ord('0')
+    assert _baseline_decode(bits_str) == 'legacy\x01'
+    for size in range(1, 20):
+        assert _feed(bits, [size]).finish() == 'legacy\x01'
+
+def test_legacy_raw_returns_latin1_bytes():
+    bits_str = ''.join(f'{c:08b}' for c in b'\xe9t\xe9') + '0' * 16
+    bits = np.frombuffer(bits_str.encode(), np.uint8) - ord('0')
+    assert _feed(bits, [4]).finish(raw=True) == b'\xe9t\xe9'
+
+#  Truncated carriers
+def test_framed_payload_cut_short():
+    bits = bitcodec.encode(frame_payload('a longer message that will not fit', 'none'))
+    decoder = _feed(bits[:-9], [16])
+    with pytest.raises(ValueError, match='exceeds carrier capacity'):
+        decoder.finish()
+
+def test_framed_length_beyond_known_capacity_fails_at_the_header():
+    raw = HEADER.pack(MAGIC, VERSION, 0, 0xFFFFFFFF, 0)
+    decoder = StreamDecoder(capacity_bits=10_000)
+    with pytest.raises(ValueError, match='exceeds carrier capacity'):
+        decoder.feed(bitcodec.encode(raw))
+
+def test_carrier_shorter_than_a_header():
+    decoder = _feed(np.ones(HEADER_BITS - 1, np.uint8), [10])
+    with pytest.raises(ValueError, match='delimiter missing'):
+        decoder.finish()
+
+def test_legacy_without_delimiter():
+    bits = np.tile(np.array([0, 1], np.uint8), 5000)  # never 16 zeros in a row, and no magic
+    with pytest.raises(ValueError, match='delimiter missing'):
+        _feed(bits, [333]).finish()
+
+def test_empty_carrier():
+    with pytest.raises(ValueError, match='delimiter missing'):
+        StreamDecoder().finish()
+
+def test_header_struct_layout():
+    # magic, version, flags, stored length, crc32: 13 bytes, big-endian
+    assert HEADER.size == 13
+    assert HEADER.pack(MAGIC, 1, 2, 3, 4) == MAGIC + struct.pack('>BBII', 1, 2, 3, 4)
+
+#  Truncated image and WAV carriers
+def _png(width: int, height: int) -> io.BytesIO:
+    buf = io.BytesIO()
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)).save(buf, 'PNG')
+    buf.seek(0)
+    return buf
+
+def test_image_cut_short():
+    out = io.BytesIO()
+    stego.embed_message(_png(64, 64), out, 'x' * 500, compression='none')
+    out.seek(0)
+    cropped = io.BytesIO()
+    Image.open(out).crop((0, 0, 64, 4)).save(cropped, 'PNG')  # keeps the first rows, in embedding order
+    cropped.seek(0)
+    with pytest.raises(ValueError, match='exceeds image capacity'):
+        stego.extract_message(cropped)
+
+def test_wav_cut_short():
+    cover = io.BytesIO()
+    with wave.open(cover, 'wb') as wf:
+        wf.setnchannels(1); wf.setsampwidth(2); wf.setframerate(8000)
+        wf.writeframes(np.random.default_rng(0).integers(-500, 500, 20_000, dtype=np.int16).tobytes())
+    cover.seek(0)
+    out = io.BytesIO()
+    audio_stego.embed_text_in_wav(cover, out, 'y' * 1000, compression='none')
+    out.seek(0)
+    with wave.open(out) as wf:
+        params, frames = wf.getparams(), wf.readframes(4000)  # fewer samples than the payload's bits
+    cut = io.BytesIO()
+    with wave.open(cut, 'wb') as wf:
+        wf.setparams(params)
+        wf.writeframes(frames)
+    cut.seek(0)
+    with pytest.raises(ValueError, match='exceeds carrier capacity'):
+        audio_stego.extract_text_from_wav(cut)
@@ -0,0 +1,84 @@
+# test_jobs.py
+# Job slots shared between queues (web workers) and sealed private results.
+import os, time
+from cryptography.fernet import Fernet
+import jobs
+from jobs import DONE, FINISHED, JobQueue, Slots
+
+def _reveal(text):
+    return {'extracted': text, 'note': 'public'}
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return {}
+
+def _wait(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        record = queue.status(job_id)
+        if record['status'] in FINISHED:
+            return record
+        time.sleep(0.05)
+    raise AssertionError('job did not finish')
+
+def test_slots_are_shared_between_queues(tmp_path):
+    first, second = Slots(str(tmp_path), 2), Slots(str(tmp_path), 2)
+    a = first.acquire(1.0)
+    b = second.acquire(1.0)
+    assert a is not None and b is not None
+    assert first.acquire(1.0) is None and second.acquire(1.0) is None
+    Slots.release(a)
+    c = second.acquire(1.0)
+    assert c is not None
+    Slots.release(b); Slots.release(c)
+
+def test_slot_cost_budget(tmp_path):
+    slots = Slots(str(tmp_path), 4)
+    big = slots.acquire(50.0, max_cost=60.0)
+    assert big is not None
+    assert slots.acquire(20.0, max_cost=60.0) is None  # 50 + 20 running would pass the budget
+    small = slots.acquire(10.0, max_cost=60.0)
+    assert small is not None
+    Slots.release(big)
+    lone = slots.acquire(500.0, max_cost=60.0)
+    assert lone is None  # `small` is still running
+    Slots.release(small)
+    lone = slots.acquire(500.0, max_cost=60.0)
+    assert lone is not None  # a lone job always runs
+    Slots.release(lone)
+
+def test_private_result_is_sealed_on_disk(tmp_path):
+    owner, other = JobQueue(str(tmp_path)), JobQueue(str(tmp_path))
+    job = owner.submit(_reveal, 'the secret', private=('extracted',))
+    record = _wait(owner, job.id)
+    assert record['status'] == DONE and record['result'] == {'note': 'public'}
+    with open(os.path.join(str(tmp_path), job.id + '.json')) as f:
+        assert 'the secret' not in f.read()
+    # any web worker can open it with the key from the requester's link, and only with it
+    assert other.status(job.id, job.key)['result'] == {'note': 'public', 'extracted': 'the secret'}
+    assert other.status(job.id, Fernet.generate_key().decode())['result'] == {'note': 'public'}
+    assert 'sealed' not in other.status(job.id)
+
+def test_running_jobs_are_capped_across_queues(tmp_path):
+    queues = [JobQueue(str(tmp_path), max_workers=1) for _ in range(2)]
+    ids = [(q, q.submit(_sleep, 0.5).id) for q in queues]
+    time.sleep(0.3)
+    running = sum(q.status(i)['status'] == 'running' for q, i in ids)
+    assert running == 1
+    records = [_wait(q, i) for q, i in ids]
+    assert all(r['status'] == DONE for r in records)
+    starts = sorted(r['started'] for r in records)
+    assert starts[1] - starts[0] >= 0.4
+
+def test_waiting_job_inputs_stay_fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'TOUCH_INTERVAL', 0)
+    blob = tmp_path / 'input.bin'
+    blob.write_bytes(b'carrier')
+    os.utime(blob, (0, 0))
+    queue = JobQueue(str(tmp_path / 'jobs'), max_workers=1)
+    first = queue.submit(_sleep, 0.5)
+    second = queue.submit(_sleep, 0, inputs=(str(blob),))
+    time.sleep(0.3)
+    assert queue.status(second.id)['status'] == 'pending'
+    assert time.time() - os.stat(blob).st_mtime < 5
+    _wait(queue, first.id); _wait(queue, second.id)
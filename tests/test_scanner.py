@@ -0,0 +1,56 @@
+# test_scanner.py
+# Verdicts from the payload scanner on clean, framed and legacy carriers.
+import io
+import numpy as np
+import pytest
+from PIL import Image
+import bitcodec, scanner, stego
+
+def _png(pixels: np.ndarray) -> io.BytesIO:
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, 'PNG')
+    buf.seek(0)
+    return buf
+
+def _noise(height: int = 200, width: int = 200) -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+def _legacy(pixels: np.ndarray, text: str) -> np.ndarray:
+    # baseline framing: the text's bits, then 16 zero bits
+    pixels = pixels.copy()
+    bits = np.concatenate((bitcodec.encode(text.encode('latin-1')), np.zeros(16, np.uint8)))
+    bitcodec.write_lsb(pixels.reshape(-1)[:bits.size], bits)
+    return pixels
+
+def test_white_document_with_a_rule_is_clean():
+    page = np.full((600, 800, 3), 255, np.uint8)
+    page[2:4] = 30  # reads as 'ÿÿÿ…' then a run of zero LSBs
+    result = scanner.scan('image', _png(page))
+    assert result['verdict'] == 'clean' and result['framing'] is None
+
+@pytest.mark.parametrize('value', [0, 64, 200])
+def test_flat_image_is_clean(value):
+    assert scanner.scan('image', _png(np.full((100, 100, 3), value, np.uint8)))['verdict'] == 'clean'
+
+def test_repeated_printable_character_is_not_a_message():
+    page = _legacy(np.full((100, 100, 3), 255, np.uint8), 'AAAAAAAA')
+    assert scanner.scan('image', _png(page))['framing'] is None
+
+def test_framed_payload():
+    out = io.BytesIO()
+    stego.embed_message(_png(_noise()), out, 'hello', compression='none')
+    out.seek(0)
+    result = scanner.scan('image', out)
+    assert result['verdict'] == 'payload'
+    assert (result['framing'], result['length'], result['codec']) == ('header', 5, 'none')
+
+def test_legacy_message_in_an_embedded_looking_head():
+    result = scanner.scan('image', _png(_legacy(_noise(), 'meet at noon')))
+    assert (result['verdict'], result['framing']) == ('payload', 'legacy')
+
+def test_legacy_message_in_a_clean_head_is_only_suspicious():
+    # a smooth gradient's LSB pairs are far from even, so chance text there isn't proof
+    gradient = np.repeat(np.arange(256, dtype=np.uint8)[None, :, None] // 4 * 4, 3, axis=2).repeat(200, axis=0)
+    result = scanner.scan('image', _png(_legacy(gradient, 'meet at noon')))
+    assert result['chi_square']['head'] < scanner.CLEAN_P
+    assert (result['verdict'], result['framing']) == ('suspicious', 'legacy')
@@ -0,0 +1,88 @@
+# test_security.py
+# Encrypted payload formats: binary (0x81), hns2$ strings and the original plain
+# base64, plus the bounds on KDF parameters read from untrusted payloads.
+import base64, os, struct
+import pytest
+from cryptography.fernet import InvalidToken
+import security
+from security import (BINARY_VERSION, KDF_MAX_ITERATIONS, decrypt_bytes, decrypt_message, encrypt_bytes,
+                      encrypt_message, encrypted_size, password_to_key)
+
+FAST = 1000  # iterations for round-trips that don't test the defaults
+
+def _legacy_encrypt(message: str, password: str) -> str:
+    # the original format: base64(salt + token), PBKDF2-SHA256 with 200k iterations
+    salt = os.urandom(16)
+    token = security.Fernet(password_to_key(password, salt, 'pbkdf2-sha256', 200_000)).encrypt(message.encode())
+    return base64.b64encode(salt + token).decode()
+
+def _binary(iterations: int, algorithm_id: int = 1) -> bytes:
+    return struct.pack('>BBI16s', BINARY_VERSION, algorithm_id, iterations, bytes(16)) + bytes(64)
+
+#  Round-trips
+@pytest.mark.parametrize('algorithm', sorted(security.KDF_ALGORITHMS))
+@pytest.mark.parametrize('message', ['', 'hi', 'héllo ✓ 日本語', 'x' * 1000, b'\x00\xff raw bytes'])
+def test_binary_round_trip(message, algorithm):
+    payload = encrypt_bytes(message, 'pw', algorithm, FAST)
+    assert payload[0] == BINARY_VERSION
+    plain = message.encode() if isinstance(message, str) else message
+    assert len(payload) == encrypted_size(len(plain))
+    assert decrypt_bytes(payload, 'pw') == plain
+
+def test_binary_payload_through_decrypt_message():
+    assert decrypt_message(encrypt_bytes('hello', 'pw', iterations=FAST), 'pw') == 'hello'
+
+@pytest.mark.parametrize('algorithm', sorted(security.KDF_ALGORITHMS))
+def test_hns2_round_trip(algorithm):
+    token = encrypt_message('hello', 'pw', algorithm, FAST)
+    assert token.startswith(f'hns2${algorithm}${FAST}$')
+    assert decrypt_message(token, 'pw') == 'hello'
+    assert decrypt_message(token.encode('ascii'), 'pw') == 'hello'  # as extracted with raw=True
+    assert decrypt_bytes(token.encode('ascii'), 'pw') == b'hello'
+
+def test_legacy_base64_still_decrypts():
+    token = _legacy_encrypt('from before hns2', 'pw')
+    assert decrypt_message(token, 'pw') == 'from before hns2'
+    assert decrypt_bytes(token.encode('ascii'), 'pw') == b'from before hns2'
+
+@pytest.mark.parametrize('make', [lambda: encrypt_bytes('hello', 'pw', iterations=FAST),
+                                  lambda: encrypt_message('hello', 'pw', iterations=FAST)])
+def test_wrong_password(make):
+    with pytest.raises(InvalidToken):
+        decrypt_message(make(), 'not the password')
+
+def test_tampered_binary_payload():
+    payload = bytearray(encrypt_bytes('hello', 'pw', iterations=FAST))
+    payload[-1] ^= 0x01
+    with pytest.raises(InvalidToken):
+        decrypt_bytes(bytes(payload), 'pw')
+
+#  Untrusted KDF parameters
+@pytest.mark.parametrize('iterations', [0, KDF_MAX_ITERATIONS + 1, 2 ** 31 - 1, 0xFFFFFFFF])
+def test_binary_iterations_out_of_range(iterations):
+    with pytest.raises(ValueError, match='Malformed'):
+        decrypt_bytes(_binary(iterations), 'pw')
+    with pytest.raises(ValueError, match='Malformed'):
+        decrypt_message(_binary(iterations), 'pw')
+
+@pytest.mark.parametrize('iterations', ['0', '-1', str(KDF_MAX_ITERATIONS + 1), str(2 ** 31 - 1),
+                                        str(0xFFFFFFFF), '9' * 40, 'many', ''])
+def test_hns2_iterations_out_of_range(iterations):
+    with pytest.raises(ValueError, match='Malformed'):
+        decrypt_message(f'hns2$pbkdf2-sha256${iterations}$AAAA', 'pw')
+
+def test_binary_unknown_algorithm_or_truncated():
+    with pytest.raises(ValueError, match='Malformed'):
+        decrypt_bytes(_binary(FAST, algorithm_id=9), 'pw')
+    with pytest.raises(ValueError, match='Malformed'):
+        decrypt_bytes(_binary(FAST)[:10], 'pw')
+
+def test_hns2_unknown_algorithm_or_fields():
+    with pytest.raises(ValueError, match='Unsupported'):
+        decrypt_message('hns2$md5$1000$AAAA', 'pw')
+    with pytest.raises(ValueError, match='Malformed'):
+        decrypt_message('hns2$pbkdf2-sha256$1000', 'pw')
+
+def test_smallest_iteration_count_is_accepted():
+    payload = encrypt_bytes('edge', 'pw', iterations=1)
+    assert decrypt_bytes(payload, 'pw') == b'edge'
@@ -0,0 +1,62 @@
+# test_store.py
+# BlobStore deduplication, age/LRU eviction and the grace period.
+import io, os, time
+import pytest
+from store import BlobStore
+
+def _store(tmp_path, **opts) -> BlobStore:
+    return BlobStore(str(tmp_path), sweep_interval=0, **opts)
+
+def _age(store, digest, seconds):
+    path = store._blob_path(digest)
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+def test_identical_uploads_are_kept_once(tmp_path):
+    store = _store(tmp_path)
+    a, b = store.put(io.BytesIO(b'same')), store.put(io.BytesIO(b'same'))
+    assert a == b
+    assert open(store.path(a), 'rb').read() == b'same'
+    assert os.listdir(store._tmp) == []
+
+def test_unknown_or_malformed_digests(tmp_path):
+    store = _store(tmp_path)
+    assert store.path('0' * 64) is None
+    assert store.path('../etc/passwd') is None
+
+def test_expired_blobs_are_evicted(tmp_path):
+    store = _store(tmp_path, max_age=100)
+    old, new = store.put(io.BytesIO(b'old')), store.put(io.BytesIO(b'new'))
+    _age(store, old, 200)
+    assert store.sweep() == 3
+    assert store.path(old) is None and store.path(new) is not None
+
+def test_size_cap_evicts_least_recently_used_outside_grace(tmp_path):
+    store = _store(tmp_path, max_bytes=250, grace=60)
+    digests = [store.put(io.BytesIO(bytes([i]) * 100)) for i in range(4)]
+    for age, digest in zip((400, 300, 200, 10), digests):
+        _age(store, digest, age)
+    store.path(digests[0])  # used again: now the most recent
+    assert store.sweep() == 200
+    assert [store.path(d) is not None for d in digests] == [True, False, False, True]
+
+def test_grace_keeps_recent_blobs_over_the_cap(tmp_path):
+    store = _store(tmp_path, max_bytes=50, grace=60)
+    digests = [store.put(io.BytesIO(bytes([i]) * 100)) for i in range(3)]
+    assert store.sweep() == 0
+    assert all(store.path(d) for d in digests)
+
+def test_adopt_survives_a_sweep_between_check_and_touch(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    digest = store.put(io.BytesIO(b'payload'))
+    real_utime = os.utime
+
+    def swept_first(path, *args, **kwargs):
+        if path == store._blob_path(digest) and os.path.exists(path):
+            os.remove(path)  # the sweeper wins the race
+        return real_utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'utime', swept_first)
+    assert store.put(io.BytesIO(b'payload')) == digest
+    monkeypatch.undo()
+    assert open(store.path(digest), 'rb').read() == b'payload'
@@ -1,7 +1,123 @@
 # utils.py
-def _str_to_bits(s: str) -> str:
-    return ''.join(f'{ord(c):08b}' for c in s)
+import struct, zlib
+import numpy as np
+from bitcodec import to_bytes, decode, find_delim, legacy_text
+from compression import compress, decompress
 
-def _bits_to_str(b: str) -> str:
-    chars = [b[i:i+8] for i in range(0, len(b), 8)]
-    return ''.join(chr(int(byte, 2)) for byte in chars)
+#  Payload framing
+# Carriers start with a fixed header followed by exactly `length` payload bytes,
+# so extractors know up front how many LSBs to read.
+MAGIC = b'HNS'
+VERSION = 1
+HEADER = struct.Struct('>3sBBII')  # magic, version, flags, stored length, crc32 of stored bytes
+HEADER_BITS = HEADER.size * 8
+CODEC_MASK = 0x0F  # low flag bits hold the compression codec id
+
+def frame_payload(message, compression: str = 'auto') -> bytes:
+    codec, data = compress(to_bytes(message), compression)
+    return HEADER.pack(MAGIC, VERSION, codec, len(data), zlib.crc32(data)) + data
+
+def parse_header(raw: bytes):
+    # (length, crc, flags) of a framed payload, or None for carriers without a header
+    if len(raw) < HEADER.size:
+        return None
+    magic, version, flags, length, crc = HEADER.unpack(raw[:HEADER.size])
+    if magic != MAGIC:
+        return None
+    if version != VERSION:
+        raise ValueError(f"Unsupported payload version {version}")
+    return length, crc, flags
+
+def unpack_payload(data: bytes, crc: int, flags: int) -> bytes:
+    if zlib.crc32(data) != crc:
+        raise ValueError("Hidden message is corrupted (checksum mismatch)")
+    return decompress(flags & CODEC_MASK, data)
+
+#  Streaming decoder
+class StreamDecoder:
+    # Decodes a payload from LSB chunks fed in carrier order and reports when it has
+    # seen enough. Framed payloads keep only the bits they still need. The legacy
+    # delimiter search carries just the trailing zero run between chunks and keeps
+    # the bits scanned so far packed 8 per byte. capacity_bits, when the carrier
+    # knows it, rejects a header whose length can't fit before any of it is kept.
+    def __init__(self, capacity_bits: int = None):
+        self.capacity_bits = capacity_bits
+        self.done = False
+        self.legacy = False
+        self.payload = None  # bytes for framed payloads, str for legacy ones
+        self._parts = []
+        self._have = 0
+        self._need = HEADER_BITS
+        self._crc = None
+        self._flags = 0
+        self._packed = []
+        self._tail = np.empty(0, np.uint8)
+        self._run = 0
+
+    def feed(self, bits: np.ndarray) -> bool:
+        if self.done:
+            return True
+        if self.legacy:
+            return self._scan(bits)
+        if self._crc is not None:
+            bits = bits[:self._need - self._have]
+        self._parts.append(bits)
+        self._have += bits.size
+        if self._have < self._need:
+            return False
+        acc = np.concatenate(self._parts)
+        if self._crc is None:
+            head = parse_header(decode(acc[:HEADER_BITS]))
+            if head is None:
+                return self._start_legacy(acc)
+            length, self._crc, self._flags = head
+            self._need = HEADER_BITS + length * 8
+            if self.capacity_bits is not None and self._need > self.capacity_bits:
+                raise ValueError("Hidden message is corrupted (length exceeds carrier capacity)")
+            self._parts = [acc]
+            if self._have < self._need:
+                return False
+        self.payload = unpack_payload(decode(acc[HEADER_BITS:self._need]), self._crc, self._flags)
+        self._parts = []
+        self.done = True
+        return True
+
+    def _start_legacy(self, acc: np.ndarray) -> bool:
+        self.legacy, self._parts, self._have = True, [], 0
+        return self._scan(acc)
+
+    def _scan(self, bits: np.ndarray) -> bool:
+        window = np.concatenate((np.zeros(self._run, np.uint8), bits))
+        end = find_delim(window)
+        seen = np.concatenate((self._tail, bits))
+        if end >= 0:
+            stop = self._have - self._run + end
+            prefix = np.unpackbits(np.frombuffer(b''.join(self._packed), dtype=np.uint8))
+            self.payload = legacy_text(np.concatenate((prefix, seen))[:stop])
+            self._packed, self._tail = [], np.empty(0, np.uint8)
+            self.done = True
+            return True
+        whole = seen.size - seen.size % 8
+        self._packed.append(decode(seen[:whole]))
+        self._tail = seen[whole:]
+        self._have += bits.size
+        ones = np.flatnonzero(bits)
+        self._run = self._run + bits.size if ones.size == 0 else bits.size - 1 - int(ones[-1])
+        return False
+
+    def finish(self, raw: bool = False):
+        # call once the carrier is exhausted; returns the decoded message
+        if not self.done and not self.legacy and self._crc is None:
+            self._start_legacy(np.concatenate(self._parts) if self._parts else np.empty(0, np.uint8))
+        if not self.done:
+            if self._crc is not None:
+                raise ValueError("Hidden message is corrupted (length exceeds carrier capacity)")
+            raise ValueError("No hidden message found (delimiter missing)")
+        return self.data() if raw else self.text()
+
+    def text(self) -> str:
+        return self.payload.decode('utf-8') if isinstance(self.payload, bytes) else self.payload
+
+    def data(self) -> bytes:
+        # legacy characters are all below 256, so latin-1 gives back the embedded bytes
+        return self.payload if isinstance(self.payload, bytes) else self.payload.encode('latin-1')
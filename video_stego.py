@@ -1,20 +1,91 @@
-
 # video_stego.py
 # Simple LSB steganography for videos using OpenCV.
 # Embeds message bits into the LSB of the Blue channel across frames.
+import queue, threading, time
 import cv2
-import numpy as np
-
-DELIM = '0' * 16
-
-def _str_to_bits(s: str) -> str:
-    return ''.join(f'{ord(c):08b}' for c in s)
-
-def _bits_to_str(b: str) -> str:
-    chars = [b[i:i+8] for i in range(0, len(b), 8)]
-    return ''.join(chr(int(byte, 2)) for byte in chars)
-
-def embed_text_in_video(in_video: str, out_video: str, message: str):
+from metrics import stage, observe_stage
+import bitcodec
+from utils import frame_payload, StreamDecoder
+
+FRAME_BUDGET = 300  # frames scanned for a legacy delimiter before giving up; 0 disables
+QUEUE_DEPTH = 8  # frames buffered between pipeline stages
+LOSSLESS_CODEC = 'FFV1'
+
+_DONE = object()  # end-of-stream marker passed between pipeline stages
+
+def _put(q, item, stop) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+def _decode_stage(cap, frames, stop, timings, errors):
+    try:
+        while True:
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            timings['decode'] += time.perf_counter() - t0
+            if not ret or not _put(frames, frame, stop):
+                break
+    except Exception as e:
+        errors.append(e); stop.set()
+    finally:
+        _put(frames, _DONE, stop)
+
+def _encode_stage(writer, frames, stop, timings, errors):
+    try:
+        while True:
+            frame = _get(frames, stop)
+            if frame is _DONE:
+                break
+            t0 = time.perf_counter()
+            writer.write(frame)
+            timings['encode'] += time.perf_counter() - t0
+    except Exception as e:
+        errors.append(e); stop.set()
+
+def _embed_frame(frame, bits, bit_idx: int) -> int:
+    # only the rows of the blue channel that receive payload bits are copied
+    width = frame.shape[1]
+    n = min(frame.shape[0] * width, bits.size - bit_idx)
+    rows = -(-n // width)
+    flat = frame[:rows, :, 0].reshape(-1)
+    bitcodec.write_lsb(flat[:n], bits[bit_idx:bit_idx + n])
+    frame[:rows, :, 0] = flat.reshape(rows, width)
+    return n
+
+def probe(src: str) -> dict:
+    # container header only; some containers don't record a frame count, which
+    # leaves the capacity unknown (None) until the frames are actually read
+    cap = cv2.VideoCapture(src)
+    if not cap.isOpened():
+        raise ValueError("Cannot open video")
+    try:
+        frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    finally:
+        cap.release()
+    units = width * height * frames
+    return {'width': width, 'height': height, 'frames': frames, 'fps': fps,
+            'units': units or None, 'capacity_bits': units or None}
+
+def embed_text_in_video(in_video: str, out_video: str, message, lossless: bool = False,
+                        queue_depth: int = QUEUE_DEPTH, stats: dict = None, compression: str = 'auto'):
+    # Decode, embed and encode run as a bounded pipeline: OpenCV releases the GIL
+    # while decoding and encoding, so the reader and writer threads overlap.
     cap = cv2.VideoCapture(in_video)
     if not cap.isOpened():
         raise ValueError("Cannot open input video")
@@ -22,68 +93,90 @@ def embed_text_in_video(in_video: str, out_video: str, message: str):
     fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')  # .avi for portability
-    writer = cv2.VideoWriter(out_video, fourcc, fps, (width, height))
+    with stage('frame'):
+        bits = bitcodec.encode(frame_payload(message, compression))
+    # fail before re-encoding anything when the header already shows it won't fit
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if frames > 0 and bits.size > frames * width * height:
+        cap.release()
+        raise ValueError("Video doesn't have enough capacity for message")
 
-    bits = _str_to_bits(message) + DELIM
+    # XVID is lossy and usually destroys the LSBs; FFV1 keeps them intact. Both go in .avi
+    fourcc = cv2.VideoWriter_fourcc(*(LOSSLESS_CODEC if lossless else 'XVID'))
+    writer = cv2.VideoWriter(out_video, fourcc, fps, (width, height))
+    if not writer.isOpened():
+        cap.release()
+        raise ValueError("Cannot open output video")
     bit_idx = 0
-    total_capacity = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if bit_idx < len(bits):
-            # Flatten blue channel
-            B = frame[:, :, 0].copy()
-            h, w = B.shape
-            capacity = h * w
-            total_capacity += capacity
-            flat = B.flatten()
-            for i in range(flat.size):
-                if bit_idx >= len(bits):
-                    break
-                flat[i] = (flat[i] & ~1) | int(bits[bit_idx])
-                bit_idx += 1
-            B = flat.reshape((h, w))
-            frame[:, :, 0] = B
-
-        writer.write(frame)
-
-    cap.release()
-    writer.release()
-
-    if bit_idx < len(bits):
+    timings = {'decode': 0.0, 'embed': 0.0, 'encode': 0.0}
+    stop, errors = threading.Event(), []
+    decoded, encoded = queue.Queue(queue_depth), queue.Queue(queue_depth)
+    stages = [threading.Thread(target=_decode_stage, args=(cap, decoded, stop, timings, errors), daemon=True),
+              threading.Thread(target=_encode_stage, args=(writer, encoded, stop, timings, errors), daemon=True)]
+    started = time.perf_counter()
+    for t in stages:
+        t.start()
+    try:
+        while True:
+            frame = _get(decoded, stop)
+            if frame is _DONE:
+                break
+            if bit_idx < bits.size:
+                t0 = time.perf_counter()
+                bit_idx += _embed_frame(frame, bits, bit_idx)
+                timings['embed'] += time.perf_counter() - t0
+            if not _put(encoded, frame, stop):
+                break
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        _put(encoded, _DONE, stop)
+        for t in stages:
+            t.join()
+        cap.release()
+        writer.release()
+
+    if errors:
+        raise errors[0]
+    # decode/encode run on their own threads, so these overlap the lsb time
+    observe_stage('decode', timings['decode'])
+    observe_stage('lsb', timings['embed'])
+    observe_stage('encode', timings['encode'])
+    if stats is not None:
+        stats.update(timings, total=time.perf_counter() - started)
+
+    if bit_idx < bits.size:
         raise ValueError("Video doesn't have enough capacity for message")
 
     return out_video
 
-def extract_text_from_video(video_path: str) -> str:
+def _frame_lsbs(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield bitcodec.read_lsb(frame[:, :, 0])  # Blue channel LSB plane
+
+def extract_text_from_video(video_path: str, frame_budget: int = FRAME_BUDGET, raw: bool = False):
+    # raw=True returns the payload bytes instead of decoding them as text
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise ValueError("Cannot open video")
 
-    bits = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        B = frame[:, :, 0]  # Blue channel
-        flat = B.flatten()
-        bits.extend([str(int(px & 1)) for px in flat])
-
-        # Check delimiter early to stop reading too much
-        if len(bits) >= 16:
-            s = ''.join(bits)
-            if DELIM in s:
-                bits = s.split(DELIM)[0]
-                cap.release()
-                return _bits_to_str(bits)
-
-    cap.release()
-    s = ''.join(bits)
-    if DELIM in s:
-        s = s.split(DELIM)[0]
-        return _bits_to_str(s)
-    raise ValueError("No hidden message found (delimiter missing)")
+    # the container's frame count bounds a framed payload; without one it's unchecked
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    units = frames * int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) * int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    decoder = StreamDecoder(units if units > 0 else None)
+    try:
+        with stage('scan'):
+            for n, lsbs in enumerate(_frame_lsbs(cap), 1):
+                if decoder.feed(lsbs):
+                    break
+                # framed payloads stop on their own; only a delimiter hunt can run away
+                if frame_budget and decoder.legacy and n >= frame_budget:
+                    raise ValueError(f"No hidden message found in the first {frame_budget} frames")
+    finally:
+        cap.release()
+    return decoder.finish(raw)